@@ -6,17 +6,142 @@ Detects actionable tasks and deadlines from email content.
 import re
 import sys
 import os
+import logging
+from bisect import bisect_right
 from datetime import datetime, timedelta
+from functools import lru_cache
 import json
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT_DIR not in sys.path:
+    sys.path.append(_ROOT_DIR)
 import config
+import fast_json
+from llm_cache import LLMCache, content_key
+from llm_client import get_model, gemini_available
+from rate_limiter import get_rate_limiter
 
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+GEMINI_AVAILABLE = gemini_available()
+
+
+# LLM failures fall back to the rules; they are reported at WARNING
+log = logging.getLogger(__name__)
+
+# Patterns are compiled once at import; extraction runs them on every email
+_SENTENCE_SPLIT = re.compile(r'[.!?]+')
+_JSON_FENCE = re.compile(r'```json\s*|\s*```')
+
+_DATE_PATTERNS = [
+    re.compile(p, re.IGNORECASE) for p in (
+        r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',  # 01/05/2026, 1-5-26
+        r'((?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* \d{1,2}(?:st|nd|rd|th)?(?:,? \d{4})?)',
+        r'(\d{1,2}(?:st|nd|rd|th)? (?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*(?:,? \d{4})?)'
+    )
+]
+
+# Emails per batched Gemini request (keeps prompts under token limits)
+BATCH_SIZE = 16
+
+BATCH_PROMPT_TEMPLATE = """Extract action items and deadlines from each of the {count} emails below.
+
+Return ONLY a JSON array with exactly {count} objects, in the same order as the emails.
+Each object must have this form:
+{{"actions": ["short action item", ...], "deadlines": ["YYYY-MM-DD" or "None"]}}
+
+{emails}"""
+
+BATCH_EMAIL_TEMPLATE = """--- Email {number} ---
+Subject: {subject}
+Content: {content}
+"""
+
+# All action keywords as one alternation, so a single pass over the text finds
+# every keyword hit instead of testing each keyword against each sentence
+_ACTION_KEYWORDS = (
+    re.compile('|'.join(re.escape(kw) for kw in config.ACTION_KEYWORDS))
+    if config.ACTION_KEYWORDS else None
+)
+
+# Date string shapes accepted by _parse_date_string
+_NUMERIC_DATE = re.compile(r'(\d{1,2})([/-])(\d{1,2})\2(\d{4}|\d{2})$')
+_MONTH_FIRST_DATE = re.compile(r'([a-z]+)\s+(\d{1,2})(?:,\s+|\s+)(\d{4})$', re.IGNORECASE)
+_DAY_FIRST_DATE = re.compile(r'(\d{1,2})\s+([a-z]+)\s+(\d{4})$', re.IGNORECASE)
+
+_MONTHS = {}
+for _number, _name in enumerate((
+    'january', 'february', 'march', 'april', 'may', 'june', 'july',
+    'august', 'september', 'october', 'november', 'december'
+), 1):
+    _MONTHS[_name] = _number
+    _MONTHS[_name[:3]] = _number
+
+# Relative dates (by Friday, by end of week, by tomorrow), fused into one
+# alternation so the text is scanned once; the group name is the relative type
+_RELATIVE_DATE = re.compile(
+    r'(?P<friday>\b(?:by |before |until )?(?:this )?friday\b)'
+    r'|(?P<monday>\b(?:by |before |until )?(?:this )?monday\b)'
+    r'|(?P<tuesday>\b(?:by |before |until )?(?:this )?tuesday\b)'
+    r'|(?P<wednesday>\b(?:by |before |until )?(?:this )?wednesday\b)'
+    r'|(?P<thursday>\b(?:by |before |until )?(?:this )?thursday\b)'
+    r'|(?P<tomorrow>\b(?:by |before |until )?tomorrow\b)'
+    r'|(?P<week>\b(?:by |before |until )?(?:this )?week(?:end)?\b)'
+    r'|(?P<month>\b(?:by |before |until )?(?:end of |this )?month\b)',
+    re.IGNORECASE
+)
+
+# Every date pattern needs a digit and every relative date one of these words,
+# so text without any of them cannot yield a deadline
+_DATE_GATE = re.compile(
+    r'\d|monday|tuesday|wednesday|thursday|friday|tomorrow|week|month',
+    re.IGNORECASE
+)
+
+# Weekday name -> datetime.weekday() index
+_WEEKDAY_IDX = {
+    day: index for index, day in enumerate(
+        ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday')
+    )
+}
+
+
+@lru_cache(maxsize=16)
+def _relative_date_cached(relative_type, ordinal):
+    """
+    Resolve a relative date type for a given day.
+    
+    Keyed on the day's ordinal, so every email in a run shares one
+    computation per relative type.
+    
+    Args:
+        relative_type (str): Group name from _RELATIVE_DATE
+        ordinal (int): date.toordinal() of "today"
+        
+    Returns:
+        str: Date as YYYY-MM-DD, or 'None'
+    """
+    today = datetime.fromordinal(ordinal)
+    
+    if relative_type == 'tomorrow':
+        target = today + timedelta(days=1)
+    elif relative_type in _WEEKDAY_IDX:
+        target_day = _WEEKDAY_IDX[relative_type]
+        current_day = today.weekday()
+        days_ahead = (target_day - current_day) % 7
+        if days_ahead == 0:
+            days_ahead = 7
+        target = today + timedelta(days=days_ahead)
+    elif relative_type == 'week':
+        target = today + timedelta(days=7)
+    elif relative_type == 'month':
+        # End of current month
+        if today.month == 12:
+            target = datetime(today.year + 1, 1, 1) - timedelta(days=1)
+        else:
+            target = datetime(today.year, today.month + 1, 1) - timedelta(days=1)
+    else:
+        return 'None'
+    
+    return target.strftime('%Y-%m-%d')
 
 
 class ActionExtractor:
@@ -31,10 +156,17 @@ class ActionExtractor:
         """
         self.use_llm = use_llm and GEMINI_AVAILABLE and config.GEMINI_API_KEY
         
+        # Rule results for identical (subject, content), e.g. quoted replies
+        # in a thread, are computed once per run
+        self._rules_memo = lru_cache(maxsize=2048)(self._compute_rules)
+        
         if self.use_llm:
             try:
-                genai.configure(api_key=config.GEMINI_API_KEY)
-                self.model = genai.GenerativeModel(config.GEMINI_MODEL)
+                self.model = get_model()
+                # Parsed LLM results keyed by email content hash
+                self.cache = LLMCache('actions')
+                # Shared with every other caller of this model
+                self.rate_limiter = get_rate_limiter(config.GEMINI_MODEL)
             except Exception as e:
                 print(f"⚠️  Failed to initialize LLM for actions: {e}")
                 self.use_llm = False
@@ -63,58 +195,179 @@ class ActionExtractor:
             try:
                 return self._extract_with_llm(subject, content)
             except Exception as e:
-                print(f"      ⚠️  LLM action extraction failed: {str(e)[:50]}")
+                log.warning("      ⚠️  LLM action extraction failed: %s", str(e)[:50])
                 # Fall back to rule-based
         
         # Rule-based extraction
         return self._extract_with_rules(subject, content)
     
+    def _cache_key(self, subject, content):
+        """
+        Cache key for one email's LLM result.
+        
+        Single and batched requests share results, so both prompts are part
+        of the key: editing either one retires the cached results.
+        """
+        return content_key(
+            config.GEMINI_MODEL,
+            config.ACTION_EXTRACTION_PROMPT,
+            BATCH_PROMPT_TEMPLATE,
+            BATCH_EMAIL_TEMPLATE,
+            subject,
+            content
+        )
+    
     def _extract_with_llm(self, subject, content):
-        """Extract using Gemini LLM."""
+        """Extract using Gemini LLM (cached by content hash)."""
+        cache_key = self._cache_key(subject, content)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+        
         prompt = config.ACTION_EXTRACTION_PROMPT.format(
             subject=subject,
             content=content
         )
         
+        self.rate_limiter.acquire()
         response = self.model.generate_content(prompt)
-        result_text = response.text.strip()
         
         # Parse JSON response
-        # Remove markdown code blocks if present
-        result_text = re.sub(r'```json\s*|\s*```', '', result_text)
+        # Remove markdown code blocks if present; the response and each
+        # intermediate string are released as soon as the next one exists
+        result_text = _JSON_FENCE.sub('', response.text.strip())
+        del response, prompt
         
         try:
-            result = json.loads(result_text)
-            actions = result.get('actions', [])
-            deadlines = result.get('deadlines', [])
-            
-            # Format output
-            actions_str = '; '.join(actions) if actions else 'None'
-            due_date = deadlines[0] if deadlines and deadlines[0] != 'None' else 'None'
-            
-            return {
-                'actions': actions_str[:500],  # Limit length for Sheets
-                'due_date': due_date
-            }
+            result = fast_json.loads(result_text)
+            del result_text
+            extracted = self._format_llm_result(result)
+            del result
+            self.cache.set(cache_key, extracted)
+            return dict(extracted)
         except json.JSONDecodeError:
             # LLM returned invalid JSON, fall back
             return self._extract_with_rules(subject, content)
     
+    def _format_llm_result(self, result):
+        """Convert one parsed LLM JSON object into the output dict."""
+        actions = result.get('actions', [])
+        deadlines = result.get('deadlines', [])
+        
+        # Format output
+        actions_str = '; '.join(actions) if actions else 'None'
+        due_date = deadlines[0] if deadlines and deadlines[0] != 'None' else 'None'
+        
+        return {
+            'actions': actions_str[:500],  # Limit length for Sheets
+            'due_date': due_date
+        }
+    
+    def extract_batch(self, parsed_emails):
+        """
+        Extract action items for many emails with one Gemini request per chunk.
+        
+        Emails are sent BATCH_SIZE at a time in a single prompt that asks for
+        a JSON array of results. Cached emails are not sent at all, and any
+        email whose batched result is missing or malformed goes through the
+        single-email extract() path instead.
+        
+        Args:
+            parsed_emails (list): Parsed emails with 'subject', 'content'
+            
+        Returns:
+            list: Result dicts (as returned by extract()), aligned with input
+        """
+        if not config.ENABLE_ACTION_EXTRACTION or not self.use_llm:
+            return [self.extract(email) for email in parsed_emails]
+        
+        results = [None] * len(parsed_emails)
+        pending = []  # (index, subject, content, cache_key)
+        
+        for i, email in enumerate(parsed_emails):
+            subject = email.get('subject', '')
+            content = email.get('content', '')[:2000]  # Limit for LLM
+            cache_key = self._cache_key(subject, content)
+            
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                results[i] = dict(cached)
+            else:
+                pending.append((i, subject, content, cache_key))
+        
+        for start in range(0, len(pending), BATCH_SIZE):
+            chunk = pending[start:start + BATCH_SIZE]
+            
+            try:
+                batch_results = self._extract_batch_with_llm(chunk)
+            except Exception as e:
+                log.warning("      ⚠️  Batched LLM action extraction failed: %s", str(e)[:50])
+                batch_results = []
+            
+            for j, (i, _, _, cache_key) in enumerate(chunk):
+                if j < len(batch_results) and batch_results[j] is not None:
+                    self.cache.set(cache_key, batch_results[j])
+                    results[i] = dict(batch_results[j])
+                else:
+                    results[i] = self.extract(parsed_emails[i])
+        
+        return results
+    
+    def _extract_batch_with_llm(self, chunk):
+        """
+        Send one prompt for a chunk of emails and split the JSON array back.
+        
+        Returns:
+            list: Formatted result per email in chunk order (None where the
+                  model's entry was unusable), or [] if the reply is not a
+                  JSON array
+        """
+        emails_text = '\n'.join(
+            BATCH_EMAIL_TEMPLATE.format(number=n, subject=subject, content=content)
+            for n, (_, subject, content, _) in enumerate(chunk, 1)
+        )
+        prompt = BATCH_PROMPT_TEMPLATE.format(count=len(chunk), emails=emails_text)
+        
+        self.rate_limiter.acquire()
+        response = self.model.generate_content(prompt)
+        result_text = _JSON_FENCE.sub('', response.text.strip())
+        del response, prompt, emails_text
+        
+        try:
+            items = fast_json.loads(result_text)
+        except json.JSONDecodeError:
+            return []
+        finally:
+            del result_text
+        
+        if not isinstance(items, list):
+            return []
+        
+        formatted = []
+        for item in items[:len(chunk)]:
+            try:
+                formatted.append(self._format_llm_result(item))
+            except (AttributeError, TypeError):
+                formatted.append(None)
+        
+        return formatted
+    
     def _extract_with_rules(self, subject, content):
-        """Extract using rule-based pattern matching."""
-        combined_text = f"{subject} {content}".lower()
+        """Extract using rule-based pattern matching (memoized per run)."""
+        return dict(self._rules_memo(subject, content))
+    
+    def _compute_rules(self, subject, content):
+        """Run the rule-based extraction; use _extract_with_rules instead."""
+        # Lower-cased once; shared by the keyword scan and deadline extraction
+        combined_text = (subject + ' ' + content).lower()
         
         # Find action items
         actions = []
-        sentences = re.split(r'[.!?]+', combined_text)
-        
-        for sentence in sentences:
-            # Check if sentence contains action keywords
-            if any(keyword in sentence for keyword in config.ACTION_KEYWORDS):
-                # Clean and add
-                cleaned = sentence.strip()
-                if len(cleaned) > 10 and len(cleaned) < 200:
-                    actions.append(cleaned.capitalize())
+        for sentence in self._sentences_with_keywords(combined_text):
+            # Clean and add
+            cleaned = sentence.strip()
+            if len(cleaned) > 10 and len(cleaned) < 200:
+                actions.append(cleaned.capitalize())
         
         # Find deadlines
         deadline = self._extract_deadline(combined_text)
@@ -130,18 +383,40 @@ class ActionExtractor:
             'due_date': deadline
         }
     
+    def _sentences_with_keywords(self, text):
+        """
+        Return the sentences of text that contain an action keyword.
+        
+        Keyword hits are found in one scan of the whole text and mapped back
+        to sentences through the offsets of the sentence delimiters.
+        """
+        if _ACTION_KEYWORDS is None:
+            return []
+        
+        # Cheap reject: most emails have no keyword at all, so skip the
+        # delimiter scan and sentence split entirely for them
+        first_hit = _ACTION_KEYWORDS.search(text)
+        if first_hit is None:
+            return []
+        
+        delimiter_starts = [m.start() for m in _SENTENCE_SPLIT.finditer(text)]
+        hit_indices = {
+            bisect_right(delimiter_starts, m.start())
+            for m in _ACTION_KEYWORDS.finditer(text, first_hit.start())
+        }
+        
+        sentences = _SENTENCE_SPLIT.split(text)
+        return [sentences[i] for i in sorted(hit_indices)]
+    
     def _extract_deadline(self, text):
         """Extract deadline from text using patterns."""
+        # Cheap reject before running the date and relative-date scans
+        if not _DATE_GATE.search(text):
+            return 'None'
         
         # Pattern 1: Specific dates (Jan 5, January 5th, 01/05/2026)
-        date_patterns = [
-            r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',  # 01/05/2026, 1-5-26
-            r'((?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* \d{1,2}(?:st|nd|rd|th)?(?:,? \d{4})?)',
-            r'(\d{1,2}(?:st|nd|rd|th)? (?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*(?:,? \d{4})?)'
-        ]
-        
-        for pattern in date_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
+        for pattern in _DATE_PATTERNS:
+            matches = pattern.findall(text)
             if matches:
                 try:
                     # Try to parse the date
@@ -153,66 +428,56 @@ class ActionExtractor:
                     continue
         
         # Pattern 2: Relative dates (by Friday, by end of week, by tomorrow)
-        relative_patterns = {
-            r'\b(?:by |before |until )?(?:this )?friday\b': 'friday',
-            r'\b(?:by |before |until )?(?:this )?monday\b': 'monday',
-            r'\b(?:by |before |until )?(?:this )?tuesday\b': 'tuesday',
-            r'\b(?:by |before |until )?(?:this )?wednesday\b': 'wednesday',
-            r'\b(?:by |before |until )?(?:this )?thursday\b': 'thursday',
-            r'\b(?:by |before |until )?tomorrow\b': 'tomorrow',
-            r'\b(?:by |before |until )?(?:this )?week(?:end)?\b': 'week',
-            r'\b(?:by |before |until )?(?:end of |this )?month\b': 'month'
-        }
-        
-        for pattern, relative_type in relative_patterns.items():
-            if re.search(pattern, text, re.IGNORECASE):
-                return self._get_relative_date(relative_type)
+        match = _RELATIVE_DATE.search(text)
+        if match:
+            return self._get_relative_date(match.lastgroup)
         
         return 'None'
     
     def _parse_date_string(self, date_str):
-        """Parse various date string formats."""
-        formats = [
-            '%m/%d/%Y', '%m-%d-%Y', '%d/%m/%Y', '%d-%m-%Y',
-            '%m/%d/%y', '%m-%d-%y',
-            '%B %d, %Y', '%B %d %Y', '%b %d, %Y', '%b %d %Y',
-            '%d %B %Y', '%d %b %Y'
-        ]
-        
-        for fmt in formats:
-            try:
-                return datetime.strptime(date_str, fmt)
-            except:
-                continue
+        """
+        Parse the date strings produced by _DATE_PATTERNS.
         
-        return None
+        Dispatches on the shape of the string and builds the datetime
+        directly, instead of trying a list of strptime formats in turn.
+        Accepts M/D/YYYY (or D/M/YYYY when M/D is invalid), M/D/YY,
+        "Month D[,] YYYY" and "D Month YYYY", with '/' or '-' separators
+        and full or abbreviated English month names.
+        """
+        try:
+            match = _NUMERIC_DATE.match(date_str)
+            if match:
+                first, second, year = match.group(1, 3, 4)
+                if len(year) == 2:
+                    # Same pivot as strptime's %y
+                    year = int(year)
+                    year += 2000 if year < 69 else 1900
+                    return datetime(year, int(first), int(second))
+                
+                try:
+                    return datetime(int(year), int(first), int(second))
+                except ValueError:
+                    return datetime(int(year), int(second), int(first))
+            
+            match = _MONTH_FIRST_DATE.match(date_str)
+            if match:
+                month, day, year = match.groups()
+            else:
+                match = _DAY_FIRST_DATE.match(date_str)
+                if not match:
+                    return None
+                day, month, year = match.groups()
+            
+            month = _MONTHS.get(month.lower())
+            if month is None:
+                return None
+            return datetime(int(year), month, int(day))
+        except ValueError:
+            return None
     
     def _get_relative_date(self, relative_type):
         """Convert relative date to actual date."""
-        today = datetime.now()
-        
-        if relative_type == 'tomorrow':
-            target = today + timedelta(days=1)
-        elif relative_type in ['monday', 'tuesday', 'wednesday', 'thursday', 'friday']:
-            days = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
-            target_day = days.index(relative_type)
-            current_day = today.weekday()
-            days_ahead = (target_day - current_day) % 7
-            if days_ahead == 0:
-                days_ahead = 7
-            target = today + timedelta(days=days_ahead)
-        elif relative_type == 'week':
-            target = today + timedelta(days=7)
-        elif relative_type == 'month':
-            # End of current month
-            if today.month == 12:
-                target = datetime(today.year + 1, 1, 1) - timedelta(days=1)
-            else:
-                target = datetime(today.year, today.month + 1, 1) - timedelta(days=1)
-        else:
-            return 'None'
-        
-        return target.strftime('%Y-%m-%d')
+        return _relative_date_cached(relative_type, datetime.now().toordinal())
 
 
 if __name__ == "__main__":
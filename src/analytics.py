@@ -7,10 +7,30 @@ import sys
 import os
 from datetime import datetime, timedelta
 from collections import Counter, defaultdict
-import json
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT_DIR not in sys.path:
+    sys.path.append(_ROOT_DIR)
 import config
+import fast_json
+
+try:
+    # C parser; accepts the trailing 'Z' directly
+    from ciso8601 import parse_datetime as _parse_iso
+except ImportError:
+    def _parse_iso(date_str):
+        """Parse an ISO 8601 timestamp, accepting a trailing 'Z'."""
+        return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
+
+# Narrow ranges fetched for the report, with the column name for each cell
+# (None = not used). Summary, content and the other text-heavy columns are
+# never downloaded. Column A is read so rows are counted like the sheet does.
+ANALYTICS_RANGES = (
+    ('A2:B', (None, 'from')),
+    ('D2:F', ('date', 'category', 'importance')),
+    ('I2:I', ('action_items',)),
+    ('K2:M', ('has_attachments', None, 'attachment_count'))
+)
 
 
 class EmailAnalytics:
@@ -52,16 +72,20 @@ class EmailAnalytics:
             print("⚠️  No data available for analytics")
             return None
         
-        # Calculate metrics
+        date_range, daily_volume = self._compute_date_stats(data['date'])
+        
+        # Calculate metrics, one column scan each
         analytics = {
-            'total_emails': len(data),
-            'by_category': self._count_by_category(data),
-            'by_importance': self._count_by_importance(data),
-            'by_sender': self._top_senders(data, limit=10),
-            'has_attachments': self._count_attachments(data),
-            'has_actions': self._count_actions(data),
-            'date_range': self._get_date_range(data),
-            'daily_volume': self._get_daily_volume(data)
+            'total_emails': len(data['category']),
+            'by_category': self._count_by_category(data['category']),
+            'by_importance': self._count_by_importance(data['importance']),
+            'by_sender': self._top_senders(data['from'], limit=10),
+            'has_attachments': self._count_attachments(
+                data['has_attachments'], data['attachment_count']
+            ),
+            'has_actions': self._count_actions(data['action_items']),
+            'date_range': date_range,
+            'daily_volume': daily_volume
         }
         
         # Display report
@@ -73,125 +97,143 @@ class EmailAnalytics:
         return analytics
     
     def _fetch_sheet_data(self):
-        """Fetch all email data from Google Sheets."""
+        """
+        Fetch all email data from Google Sheets.
+        
+        Returns:
+            dict: Column name -> list of values (one entry per row), or an
+                  empty dict if there is no data
+        """
         if not self.sheets_service:
             print("⚠️  Sheets service not available")
-            return []
+            return {}
         
         try:
-            # Read all rows (skip header)
-            range_name = f"{config.SHEET_NAME}!A2:N"
+            # Read only the columns the metrics use (skip header), all
+            # ranges in one request
+            range_names = [f"{config.SHEET_NAME}!{cells}" for cells, _ in ANALYTICS_RANGES]
             
-            result = self.sheets_service.service.spreadsheets().values().get(
+            result = self.sheets_service.service.spreadsheets().values().batchGet(
                 spreadsheetId=config.SPREADSHEET_ID,
-                range=range_name
+                ranges=range_names
             ).execute()
             
-            rows = result.get('values', [])
+            value_ranges = [
+                value_range.get('values', [])
+                for value_range in result.get('valueRanges', [])
+            ]
             
-            # Convert to list of dicts
-            data = []
-            for row in rows:
-                # Ensure row has enough columns
-                while len(row) < 14:
-                    row.append('')
+            # Each range drops its own trailing empty rows and cells
+            row_count = max((len(rows) for rows in value_ranges), default=0)
+            
+            if not row_count:
+                return {}
+            
+            # Project each range into one list per column, so each metric
+            # scans one list
+            data = {}
+            for (_, names), rows in zip(ANALYTICS_RANGES, value_ranges):
+                width = len(names)
+                # Pad short rows with one concatenation each, and add the
+                # missing trailing rows (read-only, so they can share a list)
+                padded = [
+                    row if len(row) >= width else row + [''] * (width - len(row))
+                    for row in rows
+                ]
+                padded.extend([[''] * width] * (row_count - len(rows)))
                 
-                data.append({
-                    'message_id': row[0],
-                    'from': row[1],
-                    'subject': row[2],
-                    'date': row[3],
-                    'category': row[4] if len(row) > 4 else 'Other',
-                    'importance': int(row[5]) if len(row) > 5 and row[5].isdigit() else 2,
-                    'summary': row[6] if len(row) > 6 else '',
-                    'content': row[7] if len(row) > 7 else '',
-                    'action_items': row[8] if len(row) > 8 else 'None',
-                    'due_date': row[9] if len(row) > 9 else 'None',
-                    'has_attachments': row[10] if len(row) > 10 else 'No',
-                    'attachment_names': row[11] if len(row) > 11 else 'None',
-                    'attachment_count': int(row[12]) if len(row) > 12 and row[12].isdigit() else 0,
-                    'attachment_links': row[13] if len(row) > 13 else 'None'
-                })
+                for index, column in enumerate(zip(*padded)):
+                    if names[index]:
+                        data[names[index]] = list(column)
             
             return data
             
         except Exception as e:
             print(f"⚠️  Error fetching sheet data: {e}")
-            return []
+            return {}
     
-    def _count_by_category(self, data):
+    def _count_by_category(self, categories):
         """Count emails by category."""
-        categories = [email['category'] for email in data]
         return dict(Counter(categories))
     
-    def _count_by_importance(self, data):
+    def _count_by_importance(self, importances):
         """Count emails by importance level."""
-        importance_counts = Counter([email['importance'] for email in data])
+        # Cells are strings; coerce each distinct value once, not every row
+        importance_counts = Counter()
+        for value, count in Counter(importances).items():
+            importance_counts[int(value) if value.isdigit() else 2] += count
         return dict(sorted(importance_counts.items(), reverse=True))
     
-    def _top_senders(self, data, limit=10):
+    def _top_senders(self, senders, limit=10):
         """Get top N senders by email count."""
-        senders = [email['from'] for email in data]
         top = Counter(senders).most_common(limit)
         return dict(top)
     
-    def _count_attachments(self, data):
+    def _count_attachments(self, has_attachments, attachment_counts):
         """Count emails with/without attachments."""
-        with_attachments = sum(1 for email in data if email['has_attachments'] == 'Yes')
-        without_attachments = len(data) - with_attachments
+        with_attachments = has_attachments.count('Yes')
+        without_attachments = len(has_attachments) - with_attachments
         return {
             'with_attachments': with_attachments,
             'without_attachments': without_attachments,
-            'total_attachments': sum(email['attachment_count'] for email in data)
+            'total_attachments': sum(
+                int(value) * count
+                for value, count in Counter(attachment_counts).items()
+                if value.isdigit()
+            )
         }
     
-    def _count_actions(self, data):
+    def _count_actions(self, action_items):
         """Count emails with/without action items."""
-        with_actions = sum(1 for email in data if email['action_items'] != 'None')
-        without_actions = len(data) - with_actions
+        # 'Skipped': extraction gated off for a low-importance email
+        without_actions = action_items.count('None') + action_items.count('Skipped')
+        with_actions = len(action_items) - without_actions
         return {
             'with_actions': with_actions,
             'without_actions': without_actions
         }
     
-    def _get_date_range(self, data):
-        """Get date range of emails."""
-        dates = []
-        for email in data:
-            try:
-                # Parse ISO date
-                date_str = email['date']
-                if date_str:
-                    date_obj = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                    dates.append(date_obj)
-            except:
-                continue
+    def _compute_date_stats(self, date_strs):
+        """
+        Get date range and per-day email counts in a single pass.
         
-        if dates:
-            return {
-                'earliest': min(dates).strftime('%Y-%m-%d'),
-                'latest': max(dates).strftime('%Y-%m-%d'),
-                'days_span': (max(dates) - min(dates)).days
-            }
-        return {'earliest': 'N/A', 'latest': 'N/A', 'days_span': 0}
-    
-    def _get_daily_volume(self, data):
-        """Get email count per day."""
+        Args:
+            date_strs (list): ISO date strings from the sheet
+            
+        Returns:
+            tuple: (date_range dict, daily_volume dict sorted by day)
+        """
+        earliest = None
+        latest = None
         daily_counts = defaultdict(int)
         
-        for email in data:
+        for date_str in date_strs:
+            if not date_str:
+                continue
             try:
-                date_str = email['date']
-                if date_str:
-                    date_obj = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-                    day = date_obj.strftime('%Y-%m-%d')
-                    daily_counts[day] += 1
+                # Parse ISO date
+                date_obj = _parse_iso(date_str)
             except:
                 continue
+            
+            if earliest is None or date_obj < earliest:
+                earliest = date_obj
+            if latest is None or date_obj > latest:
+                latest = date_obj
+            daily_counts[date_obj.strftime('%Y-%m-%d')] += 1
+        
+        if earliest is not None:
+            date_range = {
+                'earliest': earliest.strftime('%Y-%m-%d'),
+                'latest': latest.strftime('%Y-%m-%d'),
+                'days_span': (latest - earliest).days
+            }
+        else:
+            date_range = {'earliest': 'N/A', 'latest': 'N/A', 'days_span': 0}
         
         # Sort by date
         sorted_daily = dict(sorted(daily_counts.items()))
-        return sorted_daily
+        return date_range, sorted_daily
     
     def _display_report(self, analytics):
         """Display analytics report in console."""
@@ -271,8 +313,8 @@ class EmailAnalytics:
             
             # Also save as JSON
             json_path = report_path.replace('.txt', '.json')
-            with open(json_path, 'w') as f:
-                json.dump(analytics, f, indent=2)
+            with open(json_path, 'wb') as f:
+                f.write(fast_json.dumps(analytics, indent=True))
             
             print(f"\n💾 Report saved to:")
             print(f"   {report_path}")
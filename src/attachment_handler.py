@@ -5,10 +5,100 @@ Detects, downloads, and manages email attachments.
 
 import os
 import sys
-import base64
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT_DIR not in sys.path:
+    sys.path.append(_ROOT_DIR)
 import config
+from http_transport import authorized_http
+
+try:
+    # SIMD-accelerated drop-in for the base64 module
+    import pybase64 as _b64
+except ImportError:
+    import base64 as _b64
+
+# Per-attachment detail is DEBUG so it is never formatted at the default level
+log = logging.getLogger(__name__)
+
+# Above this size, decode with validate=True: pybase64 then hands the whole
+# buffer to its SIMD kernel instead of first filtering stray characters
+LARGE_PAYLOAD_BYTES = 64 * 1024
+
+
+def _decode_attachment_data(data):
+    """
+    Decode Gmail's URL-safe base64 attachment payload.
+    
+    Args:
+        data (str): Base64url data from attachments().get()
+        
+    Returns:
+        bytes: Decoded file contents
+    """
+    if len(data) > LARGE_PAYLOAD_BYTES:
+        try:
+            return _b64.b64decode(data, altchars=b'-_', validate=True)
+        except ValueError:
+            # Not strictly valid (e.g. embedded whitespace); use lenient path
+            pass
+    return _b64.urlsafe_b64decode(data)
+
+
+def _unique_filename(filename, taken):
+    """
+    Pick a file name not yet used in a message folder.
+    
+    Messages often carry several parts with the same name (inline
+    "image.png", a repeated "invoice.pdf"); they are saved concurrently, so
+    each needs its own path. Later copies become "name (1).ext", ...
+    
+    Args:
+        filename (str): Attachment file name
+        taken (set): Lower-cased names already used (updated in place)
+        
+    Returns:
+        str: filename, or a numbered variant of it
+    """
+    stem, ext = os.path.splitext(filename)
+    candidate = filename
+    counter = 1
+    while candidate.lower() in taken:
+        candidate = f"{stem} ({counter}){ext}"
+        counter += 1
+    taken.add(candidate.lower())
+    return candidate
+
+
+def _write_all(fd, data):
+    """
+    Write a whole buffer to a raw file descriptor.
+    
+    Args:
+        fd (int): Open file descriptor
+        data (bytes): Buffer to write
+        
+    Returns:
+        int: Number of bytes written (len(data))
+    """
+    view = memoryview(data)
+    written = 0
+    while written < len(view):
+        # os.write may write less than asked; continue from where it stopped
+        written += os.write(fd, view[written:])
+    return written
+
+
+# Emails whose attachments process_attachments_batch() downloads at once,
+# each worker on its own Gmail connection
+DOWNLOAD_WORKERS = 4
+
+# Payloads longer than this are decoded and written in slices, so the decoded
+# file is never held in memory in full. Must be a multiple of 4.
+STREAM_CHUNK_CHARS = 4 * 1024 * 1024
 
 
 class AttachmentHandler:
@@ -23,17 +113,28 @@ class AttachmentHandler:
         """
         self.gmail_service = gmail_service
         
+        # Decoding and disk writes run here; Gmail requests stay on the
+        # calling thread since the API client is not thread-safe
+        self._pool = ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1))
+        
+        # Per-thread Gmail connection ('http') for process_attachments_batch
+        # workers; unset on other threads, which use the service's own
+        self._local = threading.local()
+        
         # Create attachment directory if downloading locally
         if config.DOWNLOAD_ATTACHMENTS_LOCALLY:
             os.makedirs(config.ATTACHMENT_DIR, exist_ok=True)
     
-    def process_attachments(self, message, message_id):
+    def process_attachments(self, message, message_id, download=True):
         """
         Process attachments from a Gmail message.
         
         Args:
             message (dict): Gmail API message object
             message_id (str): Gmail message ID
+            download (bool): Download / upload the attachments. When False
+                             they are only detected (no API calls) and
+                             attachment_links is 'Skipped'
             
         Returns:
             dict: {
@@ -51,9 +152,12 @@ class AttachmentHandler:
                 'attachment_links': 'None'
             }
         
-        attachments = self._detect_attachments(message)
+        # Detect and filter by size and type in one pass over the parts
+        valid_attachments = [
+            att for att in self._iter_attachments(message) if self._is_valid(att)
+        ]
         
-        if not attachments:
+        if not valid_attachments:
             return {
                 'has_attachments': 'No',
                 'attachment_names': 'None',
@@ -61,45 +165,47 @@ class AttachmentHandler:
                 'attachment_links': 'None'
             }
         
-        # Filter by size and type
-        valid_attachments = []
-        for att in attachments:
-            # Check size
-            size_mb = att['size'] / (1024 * 1024)
-            if size_mb > config.MAX_ATTACHMENT_SIZE_MB:
-                print(f"      ⏭️  Skipping large attachment: {att['filename']} ({size_mb:.1f}MB)")
-                continue
-            
-            # Check type (if specified)
-            if config.ALLOWED_ATTACHMENT_TYPES:
-                if att['mime_type'] not in config.ALLOWED_ATTACHMENT_TYPES:
-                    print(f"      ⏭️  Skipping unsupported type: {att['filename']} ({att['mime_type']})")
-                    continue
-            
-            valid_attachments.append(att)
-        
-        if not valid_attachments:
+        if not download:
             return {
-                'has_attachments': 'No',
-                'attachment_names': 'None',
-                'attachment_count': 0,
-                'attachment_links': 'None'
+                'has_attachments': 'Yes',
+                'attachment_names': ', '.join(att['filename'] for att in valid_attachments),
+                'attachment_count': len(valid_attachments),
+                'attachment_links': 'Skipped'
             }
         
         # Process valid attachments
         attachment_names = []
         attachment_links = []
         
+        # Fetch every payload for this message in one batch request
+        fetched = {}
+        if config.DOWNLOAD_ATTACHMENTS_LOCALLY:
+            fetched = self._fetch_attachments_batch(message_id, valid_attachments)
+            # Created once here rather than by each worker
+            message_folder = os.path.join(config.ATTACHMENT_DIR, message_id)
+            os.makedirs(message_folder, exist_ok=True)
+        
+        saves = []  # (index in attachment_links, filename, future)
+        saved_names = set()  # Names used in message_folder
+        
         for att in valid_attachments:
             attachment_names.append(att['filename'])
             
             # Download locally if enabled
             if config.DOWNLOAD_ATTACHMENTS_LOCALLY:
                 try:
-                    filepath = self._download_attachment(message_id, att)
-                    attachment_links.append(filepath)
+                    # Popped so the payload is freed once it has been saved
+                    att_data = fetched.pop(att['attachment_id'], None)
+                    if att_data is None:
+                        att_data = self._fetch_attachment(message_id, att)
+                    filename = _unique_filename(att['filename'], saved_names)
+                    future = self._pool.submit(
+                        self._save_attachment, message_folder, filename, att_data
+                    )
+                    saves.append((len(attachment_links), filename, future))
+                    attachment_links.append(None)  # Filled in below
                 except Exception as e:
-                    print(f"      ⚠️  Failed to download {att['filename']}: {e}")
+                    log.warning("      ⚠️  Failed to download %s: %s", att['filename'], e)
                     attachment_links.append('Download failed')
             
             # Upload to Drive if enabled (placeholder)
@@ -107,6 +213,16 @@ class AttachmentHandler:
                 # TODO: Implement Drive upload in future
                 attachment_links.append('Drive upload not implemented')
         
+        # Collect decode/write results, keeping links in attachment order
+        for index, filename, future in saves:
+            try:
+                filepath, size = future.result()
+                log.debug("      📎 Downloaded: %s (%d bytes)", filename, size)
+                attachment_links[index] = filepath
+            except Exception as e:
+                log.warning("      ⚠️  Failed to download %s: %s", filename, e)
+                attachment_links[index] = 'Download failed'
+        
         return {
             'has_attachments': 'Yes',
             'attachment_names': ', '.join(attachment_names),
@@ -114,98 +230,222 @@ class AttachmentHandler:
             'attachment_links': ', '.join(attachment_links) if attachment_links else 'None'
         }
     
-    def _detect_attachments(self, message):
+    def process_attachments_batch(self, emails):
         """
-        Detect attachments in message payload.
+        Run process_attachments() for many emails concurrently.
+        
+        Each worker thread sends its Gmail requests on its own connection
+        (over HTTP/2 they share one), so the non-thread-safe API client
+        connection is never used by two threads at once.
         
         Args:
-            message (dict): Gmail message object
+            emails (list): (Gmail message, message ID) tuples
             
         Returns:
-            list: List of attachment dicts
+            dict: {message_id: attachment result} for every email processed
+                  without an error; callers retry the rest individually
+        """
+        results = {}
+        
+        def process(email):
+            message, message_id = email
+            if not hasattr(self._local, 'http') and self.gmail_service:
+                self._local.http = authorized_http(self.gmail_service.credentials)
+            try:
+                results[message_id] = self.process_attachments(message, message_id)
+            except Exception:
+                pass
+        
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as pool:
+            list(pool.map(process, emails))
+        
+        return results
+    
+    def _is_valid(self, att):
+        """
+        Check an attachment against the size and type limits.
+        
+        Args:
+            att (dict): Attachment dict from _iter_attachments()
+            
+        Returns:
+            bool: True if the attachment should be processed
+        """
+        # Check size
+        size_mb = att['size'] / (1024 * 1024)
+        if size_mb > config.MAX_ATTACHMENT_SIZE_MB:
+            log.debug("      ⏭️  Skipping large attachment: %s (%.1fMB)", att['filename'], size_mb)
+            return False
+        
+        # Check type (if specified)
+        if config.ALLOWED_ATTACHMENT_TYPES:
+            if att['mime_type'] not in config.ALLOWED_ATTACHMENT_TYPES:
+                log.debug("      ⏭️  Skipping unsupported type: %s (%s)", att['filename'], att['mime_type'])
+                return False
+        
+        return True
+    
+    def _iter_attachments(self, message):
+        """
+        Yield attachments in message payload.
+        
+        Walks nested MIME parts with an explicit stack (depth-first, in
+        part order) instead of recursing, and yields each attachment as it
+        is found rather than building a list.
+        
+        Args:
+            message (dict): Gmail message object
+            
+        Yields:
+            dict: Attachment with 'filename', 'attachment_id', 'size',
+                  'mime_type'
         """
-        attachments = []
         payload = message.get('payload', {})
         
         # Check if multipart
         if 'parts' in payload:
-            for part in payload['parts']:
-                attachments.extend(self._extract_attachments_from_part(part))
+            stack = payload['parts'][::-1]
+        elif payload.get('filename'):
+            # Single part - it's an attachment
+            stack = [payload]
         else:
-            # Single part - check if it's an attachment
-            if payload.get('filename'):
-                attachments.extend(self._extract_attachments_from_part(payload))
+            return
         
-        return attachments
+        while stack:
+            part = stack.pop()
+            filename = part.get('filename', '')
+            
+            if filename:
+                # This part has an attachment
+                body = part.get('body', {})
+                yield {
+                    'filename': filename,
+                    'attachment_id': body.get('attachmentId'),
+                    'size': body.get('size', 0),
+                    'mime_type': part.get('mimeType', 'application/octet-stream')
+                }
+            
+            # Check nested parts (reversed so they pop in order)
+            if 'parts' in part:
+                stack.extend(reversed(part['parts']))
     
-    def _extract_attachments_from_part(self, part):
-        """Recursively extract attachments from message part."""
-        attachments = []
-        
-        filename = part.get('filename', '')
-        
-        if filename:
-            # This part has an attachment
-            body = part.get('body', {})
-            attachment_id = body.get('attachmentId')
-            size = body.get('size', 0)
-            mime_type = part.get('mimeType', 'application/octet-stream')
+    def _fetch_attachments_batch(self, message_id, attachments):
+        """
+        Fetch attachment payloads for one message in a single batch request.
+        
+        Args:
+            message_id (str): Gmail message ID
+            attachments (list): Attachment metadata dicts
             
-            attachments.append({
-                'filename': filename,
-                'attachment_id': attachment_id,
-                'size': size,
-                'mime_type': mime_type
-            })
-        
-        # Check nested parts
-        if 'parts' in part:
-            for subpart in part['parts']:
-                attachments.extend(self._extract_attachments_from_part(subpart))
-        
-        return attachments
+        Returns:
+            dict: {attachment_id: attachment response} for every payload
+                  fetched successfully; missing ones are fetched individually
+                  by _fetch_attachment()
+        """
+        if not self.gmail_service:
+            return {}
+        
+        wanted = [att['attachment_id'] for att in attachments if att['attachment_id']]
+        if len(wanted) < 2:
+            # Nothing to gain over a plain request
+            return {}
+        
+        service = self.gmail_service.service
+        fetched = {}
+        
+        def on_response(request_id, response, exception):
+            if exception is None:
+                fetched[wanted[int(request_id)]] = response
+        
+        batch = service.new_batch_http_request(callback=on_response)
+        for index, attachment_id in enumerate(wanted):
+            batch.add(
+                service.users().messages().attachments().get(
+                    userId='me',
+                    messageId=message_id,
+                    id=attachment_id
+                ),
+                request_id=str(index)
+            )
+        
+        try:
+            batch.execute(http=getattr(self._local, 'http', None))
+        except Exception as e:
+            log.warning("      ⚠️  Batch attachment fetch failed: %s", e)
+        
+        return fetched
     
-    def _download_attachment(self, message_id, attachment_info):
+    def _fetch_attachment(self, message_id, attachment_info):
         """
-        Download attachment from Gmail.
+        Fetch one attachment payload from Gmail.
         
         Args:
             message_id (str): Gmail message ID
             attachment_info (dict): Attachment metadata
             
         Returns:
-            str: Local file path
+            dict: Gmail attachment response with base64url 'data'
         """
         if not self.gmail_service:
             raise Exception("Gmail service not provided to attachment handler")
         
-        # Get attachment data
-        attachment_id = attachment_info['attachment_id']
-        filename = attachment_info['filename']
-        
         # Fetch attachment from Gmail API
-        att_data = self.gmail_service.service.users().messages().attachments().get(
+        return self.gmail_service.service.users().messages().attachments().get(
             userId='me',
             messageId=message_id,
-            id=attachment_id
-        ).execute()
+            id=attachment_info['attachment_id']
+        ).execute(http=getattr(self._local, 'http', None))
+    
+    def _save_attachment(self, message_folder, filename, att_data):
+        """
+        Decode an attachment payload and write it to disk.
         
-        # Decode data
-        file_data = base64.urlsafe_b64decode(att_data['data'])
+        Runs on the worker pool; pure CPU and file I/O, no API calls.
         
-        # Save to local file
-        # Create message-specific folder
-        message_folder = os.path.join(config.ATTACHMENT_DIR, message_id)
-        os.makedirs(message_folder, exist_ok=True)
+        Args:
+            message_folder (str): Existing per-message directory
+            filename (str): Attachment file name
+            att_data (dict): Gmail attachment response
+            
+        Returns:
+            tuple: (local file path, decoded size in bytes)
+        """
+        # Take ownership of the base64 string so it is freed with this call
+        data = att_data.pop('data')
         
+        # Save to local file
         filepath = os.path.join(message_folder, filename)
         
-        with open(filepath, 'wb') as f:
-            f.write(file_data)
-        
-        print(f"      📎 Downloaded: {filename} ({len(file_data)} bytes)")
+        # Raw fd writes: each decoded buffer goes to the kernel as is,
+        # without passing through a Python-level IO buffer
+        fd = os.open(
+            filepath,
+            os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0),
+            0o644
+        )
+        try:
+            if len(data) <= STREAM_CHUNK_CHARS:
+                size = _write_all(fd, _decode_attachment_data(data))
+            else:
+                try:
+                    # Decode 4-char-aligned slices straight to disk; strict
+                    # validation so a stray character cannot shift alignment
+                    size = 0
+                    for start in range(0, len(data), STREAM_CHUNK_CHARS):
+                        size += _write_all(fd, _b64.b64decode(
+                            data[start:start + STREAM_CHUNK_CHARS],
+                            altchars=b'-_',
+                            validate=True
+                        ))
+                except ValueError:
+                    # Slices misaligned (e.g. embedded whitespace); decode whole
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    os.ftruncate(fd, 0)
+                    size = _write_all(fd, _decode_attachment_data(data))
+        finally:
+            os.close(fd)
         
-        return filepath
+        return filepath, size
 
 
 if __name__ == "__main__":
@@ -5,14 +5,21 @@ Handles authentication for both Gmail and Google Sheets APIs.
 
 import os
 import sys
+import threading
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 
 # Add parent directory to path to import config
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT_DIR not in sys.path:
+    sys.path.append(_ROOT_DIR)
 import config
 
+# Credentials from the last successful authenticate() call in this process
+_CACHED_CREDS = None
+_CREDS_LOCK = threading.Lock()
+
 
 def authenticate():
     """
@@ -25,7 +32,8 @@ def authenticate():
     4. If doesn't exist, initiates OAuth flow (opens browser)
     
     The same credentials object can be used for both Gmail and Sheets APIs
-    because we request all necessary scopes upfront.
+    because we request all necessary scopes upfront. It is cached in memory,
+    so later calls in the same run skip reading token.json while it is valid.
     
     Returns:
         Credentials: Authenticated credentials object for API access
@@ -34,6 +42,18 @@ def authenticate():
         FileNotFoundError: If credentials.json is missing
         Exception: If authentication fails
     """
+    global _CACHED_CREDS
+    
+    with _CREDS_LOCK:
+        if _CACHED_CREDS is not None and _CACHED_CREDS.valid:
+            return _CACHED_CREDS
+        
+        _CACHED_CREDS = _load_credentials()
+        return _CACHED_CREDS
+
+
+def _load_credentials():
+    """Load, refresh or create credentials; see authenticate()."""
     creds = None
     
     # Check if we have a token from previous authentication
@@ -100,6 +120,11 @@ def revoke_token():
     Revoke the current token and delete local token file.
     Use this if you want to re-authenticate or change Google account.
     """
+    global _CACHED_CREDS
+    
+    with _CREDS_LOCK:
+        _CACHED_CREDS = None
+    
     if os.path.exists(config.TOKEN_FILE):
         os.remove(config.TOKEN_FILE)
         print("✅ Token revoked and deleted")
@@ -3,15 +3,41 @@ Auto-Responder Module
 Automatically replies to certain emails based on rules.
 """
 
+import re
 import sys
 import os
-import json
-import base64
+import time
+import logging
+import atexit
+import string
+from collections import deque
 from email.mime.text import MIMEText
 from datetime import datetime
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT_DIR not in sys.path:
+    sys.path.append(_ROOT_DIR)
 import config
+import fast_json
+
+try:
+    # SIMD-accelerated drop-in for the base64 module
+    import pybase64 as _b64
+except ImportError:
+    import base64 as _b64
+
+# Per-email detail is DEBUG so it is never formatted at the default level
+log = logging.getLogger(__name__)
+
+# Write the response log after this many new entries; the rest are written
+# at exit
+LOG_FLUSH_EVERY = 20
+
+# Only the most recent entries are kept in the response log
+MAX_LOG_ENTRIES = 1000
+
+# Username separators treated as spaces when deriving a sender name
+_NAME_SEPARATORS = str.maketrans('._', '  ')
 
 
 class AutoResponder:
@@ -25,8 +51,35 @@ class AutoResponder:
             gmail_service: GmailService instance for sending emails
         """
         self.gmail_service = gmail_service
-        self.response_log = []
+        self.response_log = deque(maxlen=MAX_LOG_ENTRIES)
         self._load_log()
+        
+        # Entries logged since the last save
+        self._unsaved = 0
+        atexit.register(self._flush)
+        
+        # Latest response timestamp per sender, so the "recently responded"
+        # check is a dict lookup instead of a scan of the whole log
+        self._last_ts = {}
+        for log_entry in self.response_log:
+            sender = log_entry.get('sender')
+            timestamp = log_entry.get('timestamp', 0)
+            if timestamp > self._last_ts.get(sender, 0):
+                self._last_ts[sender] = timestamp
+        
+        # Rules are static config: resolve them once, with each category's
+        # keywords compiled into one alternation so matching is a single scan
+        self._rules = {
+            category: {
+                'enabled': rules.get('enabled', False),
+                'keyword_matcher': self._compile_keywords(rules.get('keywords', [])),
+                'template_chunks': self._compile_template(rules.get('response_template'))
+            }
+            for category, rules in config.AUTO_RESPONSE_RULES.items()
+        }
+        self._enabled_categories = frozenset(
+            category for category, rules in self._rules.items() if rules['enabled']
+        )
     
     def should_respond(self, parsed_email, category):
         """
@@ -43,33 +96,47 @@ class AutoResponder:
         if not config.ENABLE_AUTO_RESPONSE:
             return False, 'disabled'
         
-        # Check if category has auto-response rules
-        if category not in config.AUTO_RESPONSE_RULES:
-            return False, 'no_rule'
-        
-        rules = config.AUTO_RESPONSE_RULES[category]
-        
-        # Check if auto-response is enabled for this category
-        if not rules.get('enabled', False):
+        # Check if category has auto-response rules and they are enabled;
+        # one set lookup gates all the per-email work below
+        if category not in self._enabled_categories:
+            if category not in self._rules:
+                return False, 'no_rule'
             return False, 'category_disabled'
         
+        rules = self._rules[category]
+        
         # Check if already responded to this sender recently
         sender = parsed_email.get('from', '')
         if self._recently_responded_to(sender):
             return False, 'already_responded'
         
-        # Check if keywords match
-        content = parsed_email.get('content', '').lower()
-        subject = parsed_email.get('subject', '').lower()
-        combined = f"{subject} {content}"
-        
-        keywords = rules.get('keywords', [])
-        if keywords:
-            if not any(kw.lower() in combined for kw in keywords):
+        # Check if keywords match (the lower-cased copy of the body is only
+        # built when there are keywords to look for)
+        keyword_matcher = rules['keyword_matcher']
+        if keyword_matcher is not None:
+            content = parsed_email.get('content', '')
+            subject = parsed_email.get('subject', '')
+            combined = f"{subject} {content}".lower()
+            
+            if not keyword_matcher.search(combined):
                 return False, 'keywords_not_matched'
         
         return True, category
     
+    def _compile_keywords(self, keywords):
+        """
+        Compile keywords into one case-folded alternation.
+        
+        Args:
+            keywords (list): Keywords from AUTO_RESPONSE_RULES
+            
+        Returns:
+            re.Pattern or None: Matcher for lower-cased text, None if no keywords
+        """
+        if not keywords:
+            return None
+        return re.compile('|'.join(re.escape(kw.lower()) for kw in keywords))
+    
     def generate_response(self, parsed_email, response_type):
         """
         Generate auto-response content.
@@ -84,13 +151,16 @@ class AutoResponder:
         if response_type not in config.AUTO_RESPONSE_RULES:
             return None
         
-        template = config.AUTO_RESPONSE_RULES[response_type]['response_template']
-        
         # Extract sender name from email
         sender_email = parsed_email.get('from', '')
         sender_name = self._extract_name(sender_email)
         
         # Fill template
+        chunks = self._rules[response_type]['template_chunks']
+        if chunks is not None:
+            return sender_name.join(chunks)
+        
+        template = config.AUTO_RESPONSE_RULES[response_type]['response_template']
         response = template.format(
             sender_name=sender_name,
             my_name=config.MY_NAME
@@ -98,6 +168,42 @@ class AutoResponder:
         
         return response
     
+    def _compile_template(self, template):
+        """
+        Pre-split a response template around {sender_name}.
+        
+        {my_name} is the same for every email, so it is filled in here and
+        a response is just sender_name.join(chunks).
+        
+        Args:
+            template (str): str.format template from AUTO_RESPONSE_RULES
+            
+        Returns:
+            list or None: Literal chunks, or None if the template uses other
+                          fields or format specs (filled with str.format)
+        """
+        if template is None:
+            return None
+        
+        chunks = ['']
+        try:
+            for literal, field, spec, conversion in string.Formatter().parse(template):
+                chunks[-1] += literal
+                if field is None:
+                    continue
+                if spec or conversion:
+                    return None
+                if field == 'my_name':
+                    chunks[-1] += str(config.MY_NAME)
+                elif field == 'sender_name':
+                    chunks.append('')
+                else:
+                    return None
+        except ValueError:
+            return None
+        
+        return chunks
+    
     def send_response(self, message_id, parsed_email, response_text):
         """
         Send auto-response email.
@@ -111,12 +217,12 @@ class AutoResponder:
             bool: True if sent successfully, False otherwise
         """
         if not self.gmail_service:
-            print("      ⚠️  Gmail service not available for sending")
+            log.warning("      ⚠️  Gmail service not available for sending")
             return False
         
         if config.AUTO_RESPONSE_DRY_RUN:
-            print(f"      🧪 DRY RUN: Would send response to {parsed_email['from']}")
-            print(f"      📝 Response preview: {response_text[:100]}...")
+            log.info("      🧪 DRY RUN: Would send response to %s", parsed_email['from'])
+            log.info("      📝 Response preview: %s...", response_text[:100])
             return True  # Pretend success in dry run
         
         try:
@@ -124,15 +230,10 @@ class AutoResponder:
             sender = parsed_email.get('from', '')
             subject = parsed_email.get('subject', '')
             
-            # Create MIME message
-            message = MIMEText(response_text)
-            message['to'] = sender
-            message['subject'] = f"Re: {subject}"
-            message['In-Reply-To'] = message_id
-            message['References'] = message_id
-            
-            # Encode message
-            raw_message = base64.urlsafe_b64encode(message.as_bytes()).decode('utf-8')
+            # Create and encode message
+            raw_message = _b64.urlsafe_b64encode(
+                self._build_message(sender, subject, message_id, response_text)
+            ).decode('ascii')
             
             # Send via Gmail API
             sent_message = self.gmail_service.service.users().messages().send(
@@ -140,7 +241,7 @@ class AutoResponder:
                 body={'raw': raw_message}
             ).execute()
             
-            print(f"      ✅ Auto-response sent to {sender}")
+            log.debug("      ✅ Auto-response sent to %s", sender)
             
             # Log the response
             self._log_response(sender, message_id, response_text)
@@ -148,22 +249,61 @@ class AutoResponder:
             return True
             
         except Exception as e:
-            print(f"      ❌ Failed to send auto-response: {e}")
+            log.warning("      ❌ Failed to send auto-response: %s", e)
             return False
     
+    def _build_message(self, sender, subject, message_id, response_text):
+        """
+        Build the raw RFC 5322 reply.
+        
+        Plain-ASCII headers (the usual case) are written directly; anything
+        else goes through MIMEText so headers get RFC 2047 encoding.
+        
+        Args:
+            sender (str): Recipient (the original sender)
+            subject (str): Original subject
+            message_id (str): Original message ID
+            response_text (str): Response content
+            
+        Returns:
+            bytes: Message ready for base64url encoding
+        """
+        headers = (sender, subject, message_id)
+        if all(value.isascii() and '\r' not in value and '\n' not in value for value in headers):
+            return (
+                f"To: {sender}\r\n"
+                f"Subject: Re: {subject}\r\n"
+                f"In-Reply-To: {message_id}\r\n"
+                f"References: {message_id}\r\n"
+                "MIME-Version: 1.0\r\n"
+                "Content-Type: text/plain; charset=\"utf-8\"\r\n"
+                "Content-Transfer-Encoding: 8bit\r\n"
+                "\r\n"
+                f"{response_text}"
+            ).encode('utf-8')
+        
+        message = MIMEText(response_text)
+        message['to'] = sender
+        message['subject'] = f"Re: {subject}"
+        message['In-Reply-To'] = message_id
+        message['References'] = message_id
+        return message.as_bytes()
+    
     def _extract_name(self, email_address):
         """Extract name from email address."""
         # Try to get name from "Name <email>" format
-        if '<' in email_address:
-            name = email_address.split('<')[0].strip()
+        name, bracket, _ = email_address.partition('<')
+        if bracket:
+            name = name.strip()
             if name:
                 return name
         
         # Extract from email username
-        username = email_address.split('@')[0]
+        username = email_address.partition('@')[0]
         
-        # Convert "john.doe" to "John Doe"
-        name_parts = username.replace('.', ' ').replace('_', ' ').split()
+        # Convert "john.doe" to "John Doe" ('.' and '_' mapped to spaces in
+        # one translate pass)
+        name_parts = username.translate(_NAME_SEPARATORS).split()
         name = ' '.join(word.capitalize() for word in name_parts)
         
         return name if name else 'there'
@@ -179,46 +319,55 @@ class AutoResponder:
         Returns:
             bool: True if recently responded
         """
-        cutoff_time = datetime.now().timestamp() - (hours * 3600)
+        cutoff_time = time.time() - (hours * 3600)
         
-        for log_entry in self.response_log:
-            if log_entry['sender'] == sender and log_entry['timestamp'] > cutoff_time:
-                return True
-        
-        return False
+        return self._last_ts.get(sender, 0) > cutoff_time
     
     def _log_response(self, sender, message_id, response_text):
         """Log auto-response for tracking."""
+        now = time.time()
         log_entry = {
             'sender': sender,
             'message_id': message_id,
             'response_preview': response_text[:100],
-            'timestamp': datetime.now().timestamp(),
-            'date': datetime.now().isoformat()
+            'timestamp': now,
+            'date': datetime.fromtimestamp(now).isoformat()
         }
         
         self.response_log.append(log_entry)
-        self._save_log()
+        self._last_ts[sender] = log_entry['timestamp']
+        
+        self._unsaved += 1
+        if self._unsaved >= LOG_FLUSH_EVERY:
+            self._save_log()
+    
+    def _flush(self):
+        """Save the response log if it has unsaved entries."""
+        if self._unsaved:
+            self._save_log()
     
     def _load_log(self):
         """Load response log from file."""
         if os.path.exists(config.AUTO_RESPONSE_LOG_FILE):
             try:
-                with open(config.AUTO_RESPONSE_LOG_FILE, 'r') as f:
-                    self.response_log = json.load(f)
+                with open(config.AUTO_RESPONSE_LOG_FILE, 'rb') as f:
+                    self.response_log = deque(
+                        fast_json.loads(f.read()), maxlen=MAX_LOG_ENTRIES
+                    )
             except:
-                self.response_log = []
+                self.response_log = deque(maxlen=MAX_LOG_ENTRIES)
     
     def _save_log(self):
         """Save response log to file."""
         try:
-            # Keep only last 1000 entries
-            self.response_log = self.response_log[-1000:]
+            # Oldest entries beyond MAX_LOG_ENTRIES were already dropped
+            # by the deque on append
+            with open(config.AUTO_RESPONSE_LOG_FILE, 'wb') as f:
+                f.write(fast_json.dumps(list(self.response_log)))
             
-            with open(config.AUTO_RESPONSE_LOG_FILE, 'w') as f:
-                json.dump(self.response_log, f, indent=2)
+            self._unsaved = 0
         except Exception as e:
-            print(f"      ⚠️  Failed to save response log: {e}")
+            log.warning("      ⚠️  Failed to save response log: %s", e)
 
 
 if __name__ == "__main__":
@@ -6,18 +6,80 @@ Integrates with Google Calendar to create events from emails.
 import sys
 import os
 import re
-import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from googleapiclient.discovery import build
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT_DIR not in sys.path:
+    sys.path.append(_ROOT_DIR)
 import config
+import fast_json
+from llm_cache import LLMCache, content_key
+from llm_client import get_model, gemini_available
+from rate_limiter import get_rate_limiter
 
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+# Per-event detail is DEBUG (main.py already reports each created event);
+# failures, including Gemini fallbacks, are WARNING
+log = logging.getLogger(__name__)
+
+# Concurrent Gemini requests in extract_event_details_batch; the calls are
+# network-bound, so threads overlap the waiting
+LLM_WORKERS = 8
+
+# Every date/time form in one pattern, so the text is scanned once. Each
+# alternative sits in a lookahead, so matches are reported at every position
+# (one form never hides another that overlaps it); the named group that fired
+# tells which form was found.
+_DATE_RE = re.compile(
+    r'(?=(?P<slashed>\d{1,2}[/-]\d{1,2}[/-]\d{2,4})'
+    r'|(?P<worded>(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* \d{1,2}(?:st|nd|rd|th)?(?:,? \d{4})?)'
+    r'|(?P<tomorrow>tomorrow)'
+    r'|(?P<next_week>next week))',
+    re.IGNORECASE
+)
+
+# Patterns: 10:00, 10:30 AM (clock) or 2 PM (bare)
+_TIME_RE = re.compile(
+    r'(?=(?P<hour>\d{1,2}):(?P<minute>\d{2})\s*(?P<period>am|pm)?'
+    r'|(?P<bare_hour>\d{1,2})\s*(?P<bare_period>am|pm))',
+    re.IGNORECASE
+)
+
+_JSON_FENCE = re.compile(r'```json\s*|\s*```')
+
+# Shapes accepted by _parse_date_string
+_NUMERIC_DATE = re.compile(r'(\d{1,2})([/-])(\d{1,2})\2(\d{4}|\d{2})$')
+_WORDED_DATE = re.compile(r'([a-z]+)\s+(\d{1,2})(?:,\s+|\s+)(\d{4})$', re.IGNORECASE)
+
+_MONTHS = {}
+for _number, _name in enumerate((
+    'january', 'february', 'march', 'april', 'may', 'june', 'july',
+    'august', 'september', 'october', 'november', 'december'
+), 1):
+    _MONTHS[_name] = _number
+    _MONTHS[_name[:3]] = _number
+
+# Event indicator keywords, lowercased once; the event type does not affect
+# whether an event is created, so they are kept as one flat tuple
+_CALENDAR_KEYWORDS = tuple(
+    kw.lower()
+    for keywords in config.CALENDAR_KEYWORDS.values()
+    for kw in keywords
+)
+
+# One alternation finds any keyword in a single scan (None: no keywords)
+_CALENDAR_KEYWORDS_RE = (
+    re.compile('|'.join(re.escape(kw) for kw in _CALENDAR_KEYWORDS))
+    if _CALENDAR_KEYWORDS else None
+)
+# A match straddling the subject/content join is at most this many
+# characters from it on either side
+_KEYWORD_OVERHANG = max((len(kw) for kw in _CALENDAR_KEYWORDS), default=1) - 1
+
+# Words _extract_with_rules looks for, reported at every start position so
+# overlapping words (e.g. 'zoomeeting') are all seen in one scan
+_RULE_MARKERS_RE = re.compile(r'(?=(interview|meeting|zoom|teams))')
 
 
 class CalendarService:
@@ -33,12 +95,15 @@ class CalendarService:
         """
         self.credentials = credentials
         self.service = None
-        self.use_llm = use_llm and GEMINI_AVAILABLE and config.GEMINI_API_KEY
+        self.use_llm = use_llm and config.GEMINI_API_KEY and gemini_available()
         
         if self.use_llm:
             try:
-                genai.configure(api_key=config.GEMINI_API_KEY)
-                self.model = genai.GenerativeModel(config.GEMINI_MODEL)
+                self.model = get_model()
+                # Parsed event details keyed by email content hash
+                self.cache = LLMCache('events')
+                # Shared with every other caller of this model
+                self.rate_limiter = get_rate_limiter(config.GEMINI_MODEL)
             except Exception as e:
                 print(f"⚠️  Failed to initialize LLM for calendar: {e}")
                 self.use_llm = False
@@ -48,7 +113,15 @@ class CalendarService:
     def _build_service(self):
         """Build Google Calendar API service."""
         try:
-            self.service = build('calendar', 'v3', credentials=self.credentials)
+            # Imported on demand so the module loads quickly; the discovery
+            # document ships with the client, so skip the discovery cache
+            from googleapiclient.discovery import build
+            from http_transport import build_kwargs
+            self.service = build(
+                'calendar', 'v3',
+                cache_discovery=False,
+                **build_kwargs(self.credentials)
+            )
             print("✅ Google Calendar service initialized")
         except Exception as e:
             print(f"⚠️  Failed to build Calendar service: {e}")
@@ -71,17 +144,23 @@ class CalendarService:
         if not self.service:
             return False
         
-        # Check for calendar keywords
+        # Nothing to look for
+        if _CALENDAR_KEYWORDS_RE is None:
+            return False
+        
+        # Check for calendar keywords: subject first (most hits are there),
+        # then content, without building the combined string
         subject = parsed_email.get('subject', '').lower()
-        content = parsed_email.get('content', '').lower()
-        combined = f"{subject} {content}"
+        if _CALENDAR_KEYWORDS_RE.search(subject):
+            return True
         
-        # Check if email contains event indicators
-        for event_type, keywords in config.CALENDAR_KEYWORDS.items():
-            if any(kw in combined for kw in keywords):
-                return True
+        content = parsed_email.get('content', '').lower()
+        if _CALENDAR_KEYWORDS_RE.search(content):
+            return True
         
-        return False
+        # A keyword may also span the "subject content" join
+        join = f"{subject[max(len(subject) - _KEYWORD_OVERHANG, 0):]} {content[:_KEYWORD_OVERHANG]}"
+        return _CALENDAR_KEYWORDS_RE.search(join) is not None
     
     def extract_event_details(self, parsed_email):
         """
@@ -101,29 +180,57 @@ class CalendarService:
             try:
                 return self._extract_with_llm(subject, content)
             except Exception as e:
-                print(f"      ⚠️  LLM event extraction failed: {str(e)[:50]}")
+                log.warning("      ⚠️  LLM event extraction failed: %s", str(e)[:50])
                 # Fall back to rules
         
         # Rule-based extraction
         return self._extract_with_rules(subject, content)
     
+    def extract_event_details_batch(self, parsed_emails):
+        """
+        Extract event details for many emails concurrently.
+        
+        Each email goes through extract_event_details() on a thread pool,
+        so one failed LLM call only falls back to rules for that email.
+        
+        Args:
+            parsed_emails (list): Parsed email dicts
+            
+        Returns:
+            list: Event details (or None) aligned with parsed_emails
+        """
+        if not self.use_llm or len(parsed_emails) < 2:
+            # Rule-based extraction is CPU-only; threads would not help
+            return [self.extract_event_details(email) for email in parsed_emails]
+        
+        with ThreadPoolExecutor(max_workers=min(LLM_WORKERS, len(parsed_emails))) as pool:
+            return list(pool.map(self.extract_event_details, parsed_emails))
+    
     def _extract_with_llm(self, subject, content):
-        """Extract event using Gemini LLM."""
+        """Extract event using Gemini LLM (cached by content hash)."""
+        cache_key = content_key(config.GEMINI_MODEL, config.CALENDAR_EXTRACTION_PROMPT, subject, content)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            # An empty dict records that the email has no event
+            return dict(cached) or None
+        
         prompt = config.CALENDAR_EXTRACTION_PROMPT.format(
             subject=subject,
             content=content
         )
         
+        self.rate_limiter.acquire()
         response = self.model.generate_content(prompt)
         result_text = response.text.strip()
         
         # Parse JSON
-        result_text = re.sub(r'```json\s*|\s*```', '', result_text)
+        result_text = _JSON_FENCE.sub('', result_text)
         
         try:
-            result = json.loads(result_text)
+            result = fast_json.loads(result_text)
             
             if not result.get('has_event', False):
+                self.cache.set(cache_key, {})
                 return None
             
             # Validate and format event
@@ -140,11 +247,14 @@ class CalendarService:
             if event_details['date']:
                 datetime.strptime(event_details['date'], '%Y-%m-%d')
             else:
+                self.cache.set(cache_key, {})
                 return None
             
-            return event_details
+            self.cache.set(cache_key, event_details)
+            return dict(event_details)
             
-        except (json.JSONDecodeError, ValueError):
+        except (fast_json.JSONDecodeError, ValueError):
+            # Not cached: rule results depend on today's date
             return self._extract_with_rules(subject, content)
     
     def _extract_with_rules(self, subject, content):
@@ -159,11 +269,14 @@ class CalendarService:
         # Try to extract time
         event_time = self._extract_time(combined)
         
+        # Every marker word present, from one scan
+        markers = set(_RULE_MARKERS_RE.findall(combined))
+        
         # Determine event type and title
         event_title = subject
-        if 'interview' in combined:
+        if 'interview' in markers:
             event_title = f"Interview: {subject}"
-        elif 'meeting' in combined:
+        elif 'meeting' in markers:
             event_title = f"Meeting: {subject}"
         
         return {
@@ -171,90 +284,96 @@ class CalendarService:
             'date': event_date,
             'time': event_time or '09:00',
             'duration': config.DEFAULT_EVENT_DURATION_MINUTES,
-            'location': 'Online' if 'zoom' in combined or 'teams' in combined else 'TBD',
+            'location': 'Online' if 'zoom' in markers or 'teams' in markers else 'TBD',
             'description': content[:500]
         }
     
     def _extract_date(self, text):
-        """Extract date from text."""
-        # Pattern 1: Specific dates
-        date_patterns = [
-            r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-            r'((?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]* \d{1,2}(?:st|nd|rd|th)?(?:,? \d{4})?)',
-        ]
-        
-        for pattern in date_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                try:
-                    date_str = matches[0]
-                    parsed = self._parse_date_string(date_str)
-                    if parsed:
-                        return parsed.strftime('%Y-%m-%d')
-                except:
-                    continue
+        """Extract date from lowercased text."""
+        # Single pass: keep the first match of each form
+        found = {}
+        for match in _DATE_RE.finditer(text):
+            found.setdefault(match.lastgroup, match.group(match.lastgroup))
+            if len(found) == 4:
+                break
+        
+        # Pattern 1: Specific dates, numeric before worded
+        for kind in ('slashed', 'worded'):
+            if kind in found:
+                parsed = self._parse_date_string(found[kind])
+                if parsed:
+                    return parsed.strftime('%Y-%m-%d')
         
         # Pattern 2: Relative dates
-        if 'tomorrow' in text:
+        if 'tomorrow' in found:
             return (datetime.now() + timedelta(days=1)).strftime('%Y-%m-%d')
-        elif 'next week' in text:
+        elif 'next_week' in found:
             return (datetime.now() + timedelta(days=7)).strftime('%Y-%m-%d')
         
         return None
     
     def _extract_time(self, text):
         """Extract time from text."""
-        # Patterns: 10:00, 10:30 AM, 2 PM, etc.
-        time_patterns = [
-            r'(\d{1,2}):(\d{2})\s*(am|pm)?',
-            r'(\d{1,2})\s*(am|pm)'
-        ]
-        
-        for pattern in time_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                try:
-                    if len(matches[0]) == 3:  # HH:MM AM/PM
-                        hour, minute, period = matches[0]
-                        hour = int(hour)
-                        minute = int(minute)
-                        
-                        if period and period.lower() == 'pm' and hour < 12:
-                            hour += 12
-                        elif period and period.lower() == 'am' and hour == 12:
-                            hour = 0
-                        
-                        return f"{hour:02d}:{minute:02d}"
-                    elif len(matches[0]) == 2:  # H AM/PM
-                        hour, period = matches[0]
-                        hour = int(hour)
-                        
-                        if period.lower() == 'pm' and hour < 12:
-                            hour += 12
-                        elif period.lower() == 'am' and hour == 12:
-                            hour = 0
-                        
-                        return f"{hour:02d}:00"
-                except:
-                    continue
+        # Any HH:MM time wins over an earlier bare "H AM/PM"
+        bare = None
+        for match in _TIME_RE.finditer(text):
+            if match.group('hour') is not None:  # HH:MM AM/PM
+                return self._format_time(match.group('hour'), match.group('minute'), match.group('period'))
+            if bare is None:
+                bare = match
+        
+        if bare is not None:  # H AM/PM
+            return self._format_time(bare.group('bare_hour'), '0', bare.group('bare_period'))
         
         return None
     
+    def _format_time(self, hour, minute, period):
+        """Convert matched time parts to a 24-hour HH:MM string."""
+        hour = int(hour)
+        minute = int(minute)
+        
+        if period and period.lower() == 'pm' and hour < 12:
+            hour += 12
+        elif period and period.lower() == 'am' and hour == 12:
+            hour = 0
+        
+        return f"{hour:02d}:{minute:02d}"
+    
     def _parse_date_string(self, date_str):
-        """Parse date string to datetime."""
-        formats = [
-            '%m/%d/%Y', '%m-%d-%Y', '%d/%m/%Y', '%d-%m-%Y',
-            '%m/%d/%y', '%m-%d-%y',
-            '%B %d, %Y', '%B %d %Y', '%b %d, %Y', '%b %d %Y',
-        ]
-        
-        for fmt in formats:
-            try:
-                return datetime.strptime(date_str, fmt)
-            except:
-                continue
+        """
+        Parse date string to datetime.
         
-        return None
+        Matches the shape of the string and builds the datetime directly
+        instead of trying a list of strptime formats. Accepts M/D/YYYY (or
+        D/M/YYYY when M/D is invalid), M/D/YY, and "Month D[,] YYYY" with
+        full or abbreviated month names; '/' or '-' separators.
+        """
+        try:
+            match = _NUMERIC_DATE.match(date_str)
+            if match:
+                first, second, year = match.group(1, 3, 4)
+                if len(year) == 2:
+                    # Same pivot as strptime's %y
+                    year = int(year)
+                    year += 2000 if year < 69 else 1900
+                    return datetime(year, int(first), int(second))
+                
+                try:
+                    return datetime(int(year), int(first), int(second))
+                except ValueError:
+                    return datetime(int(year), int(second), int(first))
+            
+            match = _WORDED_DATE.match(date_str)
+            if not match:
+                return None
+            
+            month, day, year = match.groups()
+            month = _MONTHS.get(month.lower())
+            if month is None:
+                return None
+            return datetime(int(year), month, int(day))
+        except ValueError:
+            return None
     
     def create_event(self, event_details):
         """
@@ -267,8 +386,8 @@ class CalendarService:
             str: Event link or 'DryRun' or 'Failed'
         """
         if config.CALENDAR_DRY_RUN:
-            print(f"      🧪 DRY RUN: Would create event '{event_details['title']}'")
-            print(f"      📅 Date: {event_details['date']} at {event_details['time']}")
+            log.info("      🧪 DRY RUN: Would create event '%s'", event_details['title'])
+            log.info("      📅 Date: %s at %s", event_details['date'], event_details['time'])
             return 'DryRun'
         
         try:
@@ -309,12 +428,12 @@ class CalendarService:
             
             event_link = created_event.get('htmlLink', 'Created')
             
-            print(f"      ✅ Calendar event created: {event_details['title']}")
+            log.debug("      ✅ Calendar event created: %s", event_details['title'])
             
             return event_link
             
         except Exception as e:
-            print(f"      ❌ Failed to create calendar event: {e}")
+            log.warning("      ❌ Failed to create calendar event: %s", e)
             return 'Failed'
 
 
@@ -5,43 +5,147 @@ Automatically categorizes emails based on content and sender.
 
 import sys
 import os
+import re
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT_DIR not in sys.path:
+    sys.path.append(_ROOT_DIR)
 import config
 
-def categorize_email(parsed_email):
+
+def _compile_category_matcher(field):
+    """
+    Compile every category's patterns for one rule field into a single regex.
+    
+    Each category becomes one capturing group, listed in CATEGORY_RULES
+    order, inside a lookahead. A finditer() pass then reports, at every
+    position where some pattern starts, the highest-priority category
+    matching there, so the text is scanned once instead of once per pattern.
+    
+    Args:
+        field (str): Rule key to compile ('senders' or 'keywords')
+        
+    Returns:
+        tuple: (compiled pattern or None if no category has patterns,
+                tuple mapping group number - 1 to category index)
+    """
+    groups = []
+    owners = []
+    kept = []  # Patterns of this and earlier categories
+    
+    for index, rules in enumerate(config.CATEGORY_RULES.values()):
+        # A pattern containing one kept earlier (same or higher priority)
+        # can never change the result: wherever it matches, that one
+        # matches too. Checking shortest first drops such patterns, which
+        # keeps the alternation small.
+        patterns = []
+        for pattern in sorted({pattern.lower() for pattern in rules.get(field, [])}, key=len):
+            if not any(shorter in pattern for shorter in kept):
+                patterns.append(pattern)
+                kept.append(pattern)
+        
+        if patterns:
+            # Deterministic longest-first order; after pruning no alternative
+            # contains another, so the order never changes the result
+            patterns.reverse()
+            groups.append('(' + '|'.join(re.escape(pattern) for pattern in patterns) + ')')
+            owners.append(index)
+    
+    if not groups:
+        return None, ()
+    
+    return re.compile('(?=' + '|'.join(groups) + ')'), tuple(owners)
+
+
+# Built once from config at import
+_CATEGORIES = tuple(config.CATEGORY_RULES)
+_SENDER_RE, _SENDER_OWNERS = _compile_category_matcher('senders')
+_KEYWORD_RE, _KEYWORD_OWNERS = _compile_category_matcher('keywords')
+
+# Gmail labels whose emails go straight to a category without the rule scan,
+# e.g. {'CATEGORY_PROMOTIONS': 'Promotions'}. Empty by default: Gmail's tabs
+# do not line up with CATEGORY_RULES (a bank alert may sit in Updates).
+GMAIL_LABEL_CATEGORIES = getattr(config, 'GMAIL_LABEL_CATEGORIES', {})
+
+
+def _best_category(matcher, owners, text):
+    """
+    Find the highest-priority category with a pattern in text.
+    
+    Args:
+        matcher: Pattern from _compile_category_matcher(), or None
+        owners (tuple): Group-to-category mapping for matcher
+        text (str): Lowercased text to scan
+        
+    Returns:
+        int or None: Index into CATEGORY_RULES, or None if nothing matched
+    """
+    if matcher is None:
+        return None
+    
+    best = None
+    for match in matcher.finditer(text):
+        index = owners[match.lastindex - 1]
+        if best is None or index < best:
+            best = index
+            if best == owners[0]:
+                # Nothing can outrank the first category with patterns
+                break
+    
+    return best
+
+
+def categorize_email(parsed_email, label_ids=None):
     """
     Automatically categorize an email based on subject, sender, and content.
     
     Uses rule-based matching with keywords and sender patterns.
+    Categories are tried in CATEGORY_RULES order; the first one whose
+    sender patterns or keywords match wins.
     Falls back to 'Other' if no category matches.
     
+    An email carrying a Gmail label listed in GMAIL_LABEL_CATEGORIES gets
+    that category directly; Gmail has already sorted it.
+    
     Args:
         parsed_email (dict): Parsed email with 'from', 'subject', 'content' keys
+        label_ids (list, optional): The message's Gmail 'labelIds'
         
     Returns:
         str: Category name (e.g., 'Banking', 'Internship', 'Work', etc.)
     """
     
+    if label_ids and GMAIL_LABEL_CATEGORIES:
+        for label in label_ids:
+            category = GMAIL_LABEL_CATEGORIES.get(label)
+            if category is not None:
+                return category
+    
     sender = parsed_email.get('from','').lower()
-    subject = parsed_email.get('subject','').lower()
-    content = parsed_email.get('content','').lower()
     
+    # Senders are short, so check them first on their own
+    sender_match = _best_category(_SENDER_RE, _SENDER_OWNERS, sender)
     
-    #Combine
-    searchable_text = f"{subject} {content} {sender}"
+    # No keyword can outrank the sender match: skip lowering and joining
+    # the (possibly 45 KB) subject and content entirely
+    if sender_match is not None and (
+        not _KEYWORD_OWNERS or _KEYWORD_OWNERS[0] >= sender_match
+    ):
+        return _CATEGORIES[sender_match]
     
-    for category,rules in config.CATEGORY_RULES.items():
-        # Check for patterns
-        sender_patterns = rules.get('senders',[])
-        if any(pattern.lower() in sender for pattern in sender_patterns):
-            return category
-        
-        # Check for keywords
-        keywords = rules.get('keywords', [])
-        if any(keyword.lower() in searchable_text for keyword in keywords):
-            return category
-        
+    subject = parsed_email.get('subject','')
+    content = parsed_email.get('content','')
+    
+    
+    #Combine, then lowercase the joined text in one pass (the separating
+    # spaces keep this identical to lowercasing each part)
+    searchable_text = f"{subject} {content} {sender}".lower()
+    
+    keyword_match = _best_category(_KEYWORD_RE, _KEYWORD_OWNERS, searchable_text)
+    
+    matches = [index for index in (sender_match, keyword_match) if index is not None]
+    if matches:
+        return _CATEGORIES[min(matches)]
         
     # Default 
     return 'Other'
@@ -64,18 +168,29 @@ def sort_emails_by_importance(emails):
     """
     Sort a list of emails by their importance level.
     
+    There are only a handful of importance levels, so emails are dropped
+    into one bucket per level in a single pass and the buckets are joined
+    from most to least important: O(N) instead of a comparison sort.
+    Equal importances keep their input order.
+    
     Args:
-        emails (list): List of parsed email dicts
+        emails (list): Tuples with the category at index 1,
+                       e.g. (message_id, category, ...)
         
     Returns:
         list: Sorted list of emails by importance
     """
     
-    return sorted(
-        emails,
-        key=lambda x:get_importance(x[1]),
-        reverse=True
-    )
+    levels = config.IMPORTANCE_LEVELS
+    buckets = {}
+    for email in emails:
+        level = levels.get(email[1], 2)
+        bucket = buckets.get(level)
+        if bucket is None:
+            bucket = buckets[level] = []
+        bucket.append(email)
+    
+    return [email for level in sorted(buckets, reverse=True) for email in buckets[level]]
     
     
     
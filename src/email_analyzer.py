@@ -0,0 +1,228 @@
+"""
+Email Analyzer Module
+Gets summary, action items and sentiment from one combined Gemini request.
+"""
+
+import os
+import re
+import sys
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT_DIR not in sys.path:
+    sys.path.append(_ROOT_DIR)
+import config
+import fast_json
+from llm_cache import LLMCache, content_key
+from rate_limiter import get_rate_limiter
+
+# A failed combined request is a WARNING; the services fill the fields in
+log = logging.getLogger(__name__)
+
+# Concurrent Gemini requests in analyze_all_batch(); the shared rate limiter
+# still caps the overall request rate
+LLM_WORKERS = 8
+
+_JSON_FENCE = re.compile(r'```json\s*|\s*```')
+
+COMBINED_PROMPT_TEMPLATE = getattr(config, 'COMBINED_PROMPT_TEMPLATE', """Analyze this email.
+
+Return ONLY a JSON object of this form:
+{{"summary": "concise 1-2 sentence summary",
+  "actions": ["short action item", ...],
+  "deadlines": ["YYYY-MM-DD" or "None"],
+  "sentiment": "positive" | "neutral" | "negative" | "urgent",
+  "urgency_score": number between 0.0 and 1.0}}
+
+From: {sender}
+Subject: {subject}
+Content: {content}""")
+
+
+class EmailAnalyzer:
+    """
+    Combined summary + action items + sentiment analysis.
+
+    The email is sent to Gemini once instead of once per feature. Results
+    are formatted and validated by the individual services, and any field
+    missing from the combined response is filled in by that service's own
+    analysis, so the output matches what the three services return.
+    """
+
+    def __init__(self, summarizer, action_extractor, sentiment_analyzer):
+        """
+        Initialize the analyzer.
+
+        Args:
+            summarizer (EmailSummarizer): Summary service (provides the model)
+            action_extractor (ActionExtractor): Action item service
+            sentiment_analyzer (SentimentAnalyzer): Sentiment service
+        """
+        self.summarizer = summarizer
+        self.action_extractor = action_extractor
+        self.sentiment_analyzer = sentiment_analyzer
+
+        # Only fuse when all three would have used the LLM anyway
+        self.use_llm = bool(
+            summarizer.model
+            and action_extractor.use_llm
+            and sentiment_analyzer.use_llm
+        )
+
+        if self.use_llm:
+            self.model = summarizer.model
+            # Combined results keyed by email content hash
+            self.cache = LLMCache('combined')
+            # Shared with every other caller of this model
+            self.rate_limiter = get_rate_limiter(config.GEMINI_MODEL)
+
+    def analyze_all(self, parsed_email):
+        """
+        Summarize, extract action items and analyze sentiment of an email.
+
+        Args:
+            parsed_email (dict): Parsed email with 'from', 'subject', 'content'
+
+        Returns:
+            dict: {
+                'summary': str,
+                'actions': {'actions': str, 'due_date': str},
+                'sentiment': {'sentiment': str, 'urgency_score': float}
+            }
+        """
+        result = None
+        if self.use_llm:
+            try:
+                result = self._analyze_with_llm(parsed_email)
+            except Exception as e:
+                log.warning("      ⚠️  Combined LLM analysis failed: %s", str(e)[:50])
+
+        # Copied so callers never share dicts with the cache
+        result = {
+            key: dict(value) if isinstance(value, dict) else value
+            for key, value in (result or {}).items()
+        }
+
+        # Fill in anything the combined request did not produce
+        if 'summary' not in result:
+            result['summary'] = self.summarizer.summarize_email(parsed_email)
+        if 'actions' not in result or not config.ENABLE_ACTION_EXTRACTION:
+            result['actions'] = self.action_extractor.extract(parsed_email)
+        if 'sentiment' not in result or not config.ENABLE_SENTIMENT_ANALYSIS:
+            result['sentiment'] = self.sentiment_analyzer.analyze(parsed_email)
+
+        return result
+
+    def analyze_all_batch(self, parsed_emails):
+        """
+        Run analyze_all() for many emails concurrently.
+
+        Args:
+            parsed_emails (list): Parsed email dicts
+
+        Returns:
+            list: Result dicts aligned with parsed_emails
+        """
+        if not self.use_llm or len(parsed_emails) < 2:
+            return [self.analyze_all(email) for email in parsed_emails]
+
+        with ThreadPoolExecutor(max_workers=min(LLM_WORKERS, len(parsed_emails))) as pool:
+            return list(pool.map(self.analyze_all, parsed_emails))
+
+    def _analyze_with_llm(self, parsed_email):
+        """
+        One combined Gemini request (cached by content hash).
+
+        Returns:
+            dict: The fields that were valid in the response (any subset of
+                  'summary', 'actions', 'sentiment'), or None if the
+                  response was not a JSON object
+        """
+        subject = parsed_email.get('subject', '')
+        sender = parsed_email.get('from', '')
+        content = parsed_email.get('content', '')[:2000]  # Limit for LLM
+
+        cache_key = content_key(
+            config.GEMINI_MODEL, 'combined', COMBINED_PROMPT_TEMPLATE, sender, subject, content
+        )
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+        prompt = COMBINED_PROMPT_TEMPLATE.format(
+            sender=sender,
+            subject=subject,
+            content=content
+        )
+
+        self.rate_limiter.acquire()
+        response = self.model.generate_content(prompt)
+        result_text = _JSON_FENCE.sub('', response.text.strip())
+
+        try:
+            result = fast_json.loads(result_text)
+        except fast_json.JSONDecodeError:
+            return None
+        if not isinstance(result, dict):
+            return None
+
+        fields = {}
+
+        summary = result.get('summary')
+        if isinstance(summary, str) and summary.strip():
+            summary = summary.strip()
+            fields['summary'] = summary[:197] + "..." if len(summary) > 200 else summary
+
+        # Malformed action or sentiment fields are left out; the service
+        # fills them in with its own analysis
+        if isinstance(result.get('actions', []), list) and isinstance(result.get('deadlines', []), list):
+            try:
+                fields['actions'] = self.action_extractor._format_llm_result(result)
+            except (AttributeError, TypeError):
+                pass
+
+        try:
+            fields['sentiment'] = self.sentiment_analyzer._format_llm_result(result)
+        except (AttributeError, TypeError, ValueError):
+            pass
+
+        # Only complete results are cached, so a partial one is retried
+        if len(fields) == 3:
+            self.cache.set(cache_key, fields)
+        return fields
+
+
+if __name__ == "__main__":
+    """Test the combined analyzer."""
+    print("=" * 60)
+    print("Testing Email Analyzer")
+    print("=" * 60)
+
+    from summarizer import EmailSummarizer
+    from action_extractor import ActionExtractor
+    from sentiment_analyzer import SentimentAnalyzer
+
+    analyzer = EmailAnalyzer(
+        EmailSummarizer(),
+        ActionExtractor(use_llm=True),
+        SentimentAnalyzer(use_llm=True)
+    )
+
+    test_email = {
+        'from': 'manager@company.com',
+        'subject': 'Please review the Q1 report by Friday',
+        'content': 'Hi, please review the attached Q1 report and send your feedback by Friday. Thanks!'
+    }
+
+    print(f"\nCombined LLM request: {'enabled' if analyzer.use_llm else 'disabled (fallbacks)'}")
+    result = analyzer.analyze_all(test_email)
+
+    print(f"\nSummary: {result['summary']}")
+    print(f"Actions: {result['actions']['actions']}")
+    print(f"Due: {result['actions']['due_date']}")
+    print(f"Sentiment: {result['sentiment']['sentiment']} | Urgency: {result['sentiment']['urgency_score']}")
+
+    print("\n" + "=" * 60)
+    print("✅ Email Analyzer Test Complete!")
+    print("=" * 60)
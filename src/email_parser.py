@@ -6,9 +6,34 @@ Extracts and formats email data from Gmail API message objects.
 import base64
 import re
 from html import unescape
+from functools import lru_cache
 from datetime import datetime
 from email.utils import parsedate_to_datetime
 
+# Headers (lowercased) that extract_headers keeps
+_WANTED_HEADERS = frozenset(('from', 'subject', 'date'))
+
+# Patterns compiled once at import instead of being looked up in re's cache
+# on every call
+_ANGLE_EMAIL_RE = re.compile(r'<([^>]+)>')
+
+# Whitespace (other than the newline itself) around each line break
+_LINE_EDGES_RE = re.compile(r'[^\S\n]*\n[^\S\n]*')
+_BLANKLINES_RE = re.compile(r'\n{3,}')
+
+# Everything html_to_text rewrites, in one alternation so the HTML is
+# scanned and copied once: script/style blocks, <br> and </p> (named, to
+# pick the replacement), then any other tag
+_HTML_RE = re.compile(
+    r'<script[^>]*>.*?</script>'
+    r'|<style[^>]*>.*?</style>'
+    r'|(?P<br><br\s*/?>)'
+    r'|(?P<p></p>)'
+    r'|<[^>]+>',
+    re.DOTALL | re.IGNORECASE
+)
+_HTML_REPLACEMENTS = {'br': '\n', 'p': '\n\n', None: ''}
+
 
 def parse_email(message):
     """
@@ -72,32 +97,38 @@ def extract_headers(payload):
     Returns:
         dict: Dictionary with 'from', 'subject', 'date' keys
     """
-    headers = {}
-    
     # Get headers list from payload
     header_list = payload.get('headers', [])
     
-    # Extract the headers we need
+    # Keep the raw value of the headers we need (last one wins); one set
+    # lookup per header instead of an if/elif chain
+    raw = {}
     for header in header_list:
         name = header.get('name', '').lower()
-        value = header.get('value', '')
-        
-        if name == 'from':
-            # Extract just email address from "Name <email@example.com>" format
-            headers['from'] = extract_email_address(value)
-        elif name == 'subject':
-            headers['subject'] = value
-        elif name == 'date':
-            # Convert to ISO format
-            headers['date'] = parse_date(value)
+        if name in _WANTED_HEADERS:
+            raw[name] = header.get('value', '')
+    
+    # Convert only the values that are actually used
+    headers = {}
+    if 'from' in raw:
+        # Extract just email address from "Name <email@example.com>" format
+        headers['from'] = extract_email_address(raw['from'])
+    if 'subject' in raw:
+        headers['subject'] = raw['subject']
+    if 'date' in raw:
+        # Convert to ISO format
+        headers['date'] = parse_date(raw['date'])
     
     return headers
 
 
+@lru_cache(maxsize=1024)
 def extract_email_address(from_header):
     """
     Extract email address from "Name <email@example.com>" format.
     
+    Memoized: the same senders recur across a batch.
+    
     Examples:
         "John Doe <john@example.com>" -> "john@example.com"
         "john@example.com" -> "john@example.com"
@@ -110,7 +141,7 @@ def extract_email_address(from_header):
         str: Clean email address
     """
     # Try to extract email from angle brackets
-    match = re.search(r'<([^>]+)>', from_header)
+    match = _ANGLE_EMAIL_RE.search(from_header)
     if match:
         return match.group(1).strip()
     
@@ -118,10 +149,14 @@ def extract_email_address(from_header):
     return from_header.strip()
 
 
+@lru_cache(maxsize=1024)
 def parse_date(date_str):
     """
     Parse email date string to ISO format.
     
+    Memoized, including the fallback for unparseable strings: bulk senders
+    often stamp many messages with the same Date header.
+    
     Email dates come in RFC 2822 format like:
     "Mon, 24 Jan 2026 10:30:45 +0000"
     
@@ -184,10 +219,13 @@ def decode_body(payload):
 
 def decode_multipart(parts):
     """
-    Recursively decode multipart email bodies.
+    Decode multipart email bodies, walking nested parts iteratively.
     
     Multipart emails have multiple parts (plain text, HTML, attachments).
-    We prefer text/plain over text/html.
+    We prefer text/plain over text/html. Nesting is followed with an
+    explicit stack rather than recursion, with the same result: each
+    level keeps its own candidates, and the first nested level that
+    yields text wins at once.
     
     Args:
         parts (list): List of message parts from Gmail API
@@ -195,47 +233,91 @@ def decode_multipart(parts):
     Returns:
         str: Decoded plain text content
     """
-    text_plain = ""
-    text_html = ""
-    
-    for part in parts:
-        mime_type = part.get('mimeType', '')
+    # One frame per nesting level: the remaining parts, the encoded
+    # plain/HTML bodies seen so far (decoded only if used), and the part
+    # whose nested parts are being walked
+    stack = [{'parts': iter(parts), 'plain': "", 'html': "", 'pending': None}]
+    
+    while stack:
+        frame = stack[-1]
+        part = next(frame['parts'], None)
+        
+        if part is None:
+            # Level finished: text found here ends the whole search
+            stack.pop()
+            content = _decode_preferred(frame['plain'], frame['html'])
+            if content:
+                return content
+            if stack:
+                # Nothing nested; the parent goes on with the part's own body
+                _remember_body(stack[-1], stack[-1]['pending'])
+            continue
         
-        # If this part has nested parts, recurse
+        # If this part has nested parts, descend first
         if 'parts' in part:
-            nested_content = decode_multipart(part['parts'])
-            if nested_content:
-                return nested_content
-        
-        # Extract body data
-        body = part.get('body', {})
-        data = body.get('data', '')
-        
-        if not data:
+            frame['pending'] = part
+            stack.append({'parts': iter(part['parts']), 'plain': "", 'html': "", 'pending': None})
             continue
         
-        # Decode based on MIME type
-        if mime_type == 'text/plain':
-            text_plain = decode_base64(data)
-        elif mime_type == 'text/html':
-            text_html = decode_base64(data)
+        _remember_body(frame, part)
+    
+    return ""
+
+
+def _remember_body(frame, part):
+    """
+    Record a part's encoded text body in its decode_multipart frame.
+    
+    Args:
+        frame (dict): Frame for the part's nesting level
+        part (dict): Message part from Gmail API
+    """
+    # Extract body data
+    body = part.get('body', {})
+    data = body.get('data', '')
+    
+    if not data:
+        return
+    
+    # Keep the last body of each MIME type
+    mime_type = part.get('mimeType', '')
+    if mime_type == 'text/plain':
+        frame['plain'] = data
+    elif mime_type == 'text/html':
+        frame['html'] = data
+
+
+def _decode_preferred(plain_data, html_data):
+    """
+    Decode the preferred body of one multipart level.
     
+    Args:
+        plain_data (str): Encoded text/plain body, or ""
+        html_data (str): Encoded text/html body, or ""
+        
+    Returns:
+        str: Plain text content, or "" if neither body yields text
+    """
     # Prefer plain text over HTML
+    text_plain = decode_base64(plain_data) if plain_data else ""
     if text_plain:
         return text_plain
-    elif text_html:
+    elif html_data:
         # Convert HTML to plain text
-        return html_to_text(text_html)
-    else:
-        return ""
+        text_html = decode_base64(html_data)
+        if text_html:
+            return html_to_text(text_html)
+    
+    return ""
 
 
 def decode_base64(data):
     """
     Decode base64 URL-safe encoded data.
     
-    Gmail API uses URL-safe base64 encoding (RFC 4648).
-    Standard base64 uses +/ but URL-safe uses -_
+    Gmail API uses URL-safe base64 encoding (RFC 4648) and may strip the
+    trailing '=' padding. urlsafe_b64decode maps -_ to +/ in C, so no
+    translated copy of the body is built first.
     
     Args:
         data (str): Base64 encoded string
@@ -244,13 +326,11 @@ def decode_base64(data):
         str: Decoded UTF-8 string
     """
     try:
-        # Gmail uses URL-safe base64, replace - and _ with + and /
-        data = data.replace('-', '+').replace('_', '/')
-        
-        # Decode from base64
-        decoded_bytes = base64.b64decode(data)
+        # Restore any stripped padding, then decode the URL-safe alphabet
+        decoded_bytes = base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
         
-        # Convert bytes to string
+        # Convert bytes to string in one pass; the UTF-8 decoder already
+        # runs pure-ASCII stretches on its fast path
         return decoded_bytes.decode('utf-8', errors='ignore')
     except Exception as e:
         print(f"⚠️  Warning: Error decoding base64: {e}")
@@ -273,16 +353,9 @@ def html_to_text(html):
         str: Plain text content
     """
     try:
-        # Remove script and style tags and their content
-        html = re.sub(r'<script[^>]*>.*?</script>', '', html, flags=re.DOTALL | re.IGNORECASE)
-        html = re.sub(r'<style[^>]*>.*?</style>', '', html, flags=re.DOTALL | re.IGNORECASE)
-        
-        # Replace <br> and <p> tags with newlines
-        html = re.sub(r'<br\s*/?>', '\n', html, flags=re.IGNORECASE)
-        html = re.sub(r'</p>', '\n\n', html, flags=re.IGNORECASE)
-        
-        # Remove all other HTML tags
-        text = re.sub(r'<[^>]+>', '', html)
+        # Remove script/style blocks and tags, turning <br> and </p>
+        # into newlines, in a single left-to-right pass
+        text = _HTML_RE.sub(lambda match: _HTML_REPLACEMENTS[match.lastgroup], html)
         
         # Unescape HTML entities
         text = unescape(text)
@@ -303,12 +376,12 @@ def clean_text(text):
     Returns:
         str: Cleaned text
     """
-    # Remove multiple consecutive blank lines
-    text = re.sub(r'\n\s*\n\s*\n', '\n\n', text)
+    # Remove leading/trailing whitespace from each line, in one C-level
+    # pass instead of split/strip/join
+    text = _LINE_EDGES_RE.sub('\n', text)
     
-    # Remove leading/trailing whitespace from each line
-    lines = [line.strip() for line in text.split('\n')]
-    text = '\n'.join(lines)
+    # Remove multiple consecutive blank lines
+    text = _BLANKLINES_RE.sub('\n\n', text)
     
     # Remove leading/trailing whitespace from entire text
     text = text.strip()
@@ -334,7 +407,9 @@ if __name__ == "__main__":
     # Import required modules
     import sys
     import os
-    sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    _ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if _ROOT_DIR not in sys.path:
+        sys.path.append(_ROOT_DIR)
     
     from auth import authenticate
     from gmail_service import GmailService
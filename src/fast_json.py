@@ -0,0 +1,56 @@
+"""
+Fast JSON Module
+Uses orjson when installed, falling back to the stdlib json module.
+"""
+
+import json
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can keep
+# catching json.JSONDecodeError either way
+JSONDecodeError = json.JSONDecodeError
+
+
+def loads(data):
+    """
+    Parse JSON from str or bytes.
+
+    Args:
+        data (str | bytes): JSON document
+
+    Returns:
+        Parsed Python object
+    """
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj, indent=False):
+    """
+    Serialize an object to JSON bytes.
+
+    Non-string dict keys (e.g. importance levels) are converted to strings,
+    matching the stdlib json behaviour.
+
+    Args:
+        obj: Object to serialize
+        indent (bool): Pretty-print with 2-space indentation
+
+    Returns:
+        bytes: UTF-8 encoded JSON
+    """
+    if ORJSON_AVAILABLE:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, option=option)
+
+    if indent:
+        return json.dumps(obj, indent=2).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
@@ -3,14 +3,67 @@ Gmail Service Module
 Handles all Gmail API operations including fetching and marking emails.
 """
 
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from googleapiclient.model import JsonModel
 import sys
 import os
+import time
 
 # Add parent directory to path to import config
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT_DIR not in sys.path:
+    sys.path.append(_ROOT_DIR)
 import config
+import fast_json
+from http_transport import authorized_http, build_kwargs
+from retry import execute, RETRY_STATUSES
+
+# Gmail accepts at most 100 calls in a single batch request
+MAX_BATCH_SIZE = 100
+
+# Batch requests kept in flight at once when a fetch needs several; Gmail
+# rejects too many concurrent requests per user, so keep this small
+MAX_CONCURRENT_BATCHES = 5
+
+# Extra batch rounds for messages that failed with a transient error
+# (Gmail answers some calls of a large batch with 429); the delay before
+# round n is BATCH_RETRY_DELAY * 2^n seconds
+BATCH_RETRY_ROUNDS = 2
+BATCH_RETRY_DELAY = 1.0
+
+# messages.batchModify accepts at most 1000 IDs per request
+MAX_MODIFY_IDS = 1000
+
+# Messages kept by fetch_message_details() for repeat lookups in one run
+MESSAGE_CACHE_SIZE = 512
+
+# Partial response for messages.get: everything the parser, categorizer and
+# attachment handler read, without historyId / sizeEstimate / internalDate.
+# The payload is kept whole, as MIME parts nest to any depth.
+MESSAGE_FIELDS = 'id,threadId,labelIds,snippet,payload'
+
+
+class FastJsonModel(JsonModel):
+    """
+    JsonModel that parses responses with fast_json (orjson when installed).
+    
+    Full-format messages are large JSON documents; orjson parses the raw
+    response bytes directly, without first decoding them to str. Also used
+    for every part of a batch response.
+    """
+    
+    def deserialize(self, content):
+        try:
+            body = fast_json.loads(content)
+        except (fast_json.JSONDecodeError, UnicodeDecodeError):
+            # Not JSON: return the text, as JsonModel does
+            return content.decode('utf-8') if isinstance(content, bytes) else content
+        if self._data_wrapper and 'data' in body:
+            body = body['data']
+        return body
 
 
 class GmailService:
@@ -25,6 +78,11 @@ class GmailService:
         """
         self.credentials = credentials
         self.service = None
+        # Last messages.list response, reused by get_message_count()
+        self._last_list_result = None
+        # Per-instance LRU of fetched messages: repeat fetches of the same
+        # message skip the API (failed fetches raise and are not cached)
+        self._get_cached = lru_cache(maxsize=MESSAGE_CACHE_SIZE)(self._fetch_uncached)
         self.build_service()
     
     def build_service(self):
@@ -35,7 +93,11 @@ class GmailService:
             Exception: If service building fails
         """
         try:
-            self.service = build('gmail', 'v1', credentials=self.credentials)
+            self.service = build(
+                'gmail', 'v1',
+                model=FastJsonModel(),
+                **build_kwargs(self.credentials)
+            )
             print("✅ Gmail service initialized")
         except Exception as e:
             raise Exception(f"Failed to build Gmail service: {e}")
@@ -70,6 +132,7 @@ class GmailService:
                 q=config.GMAIL_QUERY,
                 maxResults=max_results
             ).execute()
+            self._last_list_result = results
             
             # Extract messages from response
             messages = results.get('messages', [])
@@ -92,15 +155,21 @@ class GmailService:
             print(f"❌ Unexpected error fetching messages: {e}")
             raise
     
-    def fetch_message_details(self, message_id):
+    def fetch_message_details(self, message_id, format='full', metadata_headers=None):
         """
         Fetch full message details for a given message ID.
         
         This retrieves the complete message including headers and body.
-        The format is set to 'full' to get all message parts.
+        The format defaults to 'full' to get all message parts. Results are
+        kept in an in-memory LRU cache, so fetching the same message again
+        (same format and headers) does not call the API.
         
         Args:
             message_id (str): Gmail message ID
+            format (str): Gmail message format ('full', 'metadata',
+                          'minimal' or 'raw')
+            metadata_headers (list, optional): With format='metadata', only
+                          return these headers (e.g. ['From', 'Subject'])
             
         Returns:
             dict: Complete message object with structure:
@@ -116,16 +185,34 @@ class GmailService:
                     }
                 }
                 
+        Raises:
+            HttpError: If Gmail API request fails
+        """
+        if metadata_headers:
+            # Hashable, so it can be part of the cache key
+            metadata_headers = tuple(metadata_headers)
+        return self._get_cached(message_id, format, metadata_headers)
+    
+    def _fetch_uncached(self, message_id, format, metadata_headers):
+        """
+        Fetch a message from the API (behind the fetch_message_details cache).
+        
+        Args:
+            message_id (str): Gmail message ID
+            format (str): Gmail message format
+            metadata_headers (tuple): Headers to keep, or None
+            
+        Returns:
+            dict: Gmail message object
+            
         Raises:
             HttpError: If Gmail API request fails
         """
         try:
             # Fetch complete message
-            message = self.service.users().messages().get(
-                userId='me',
-                id=message_id,
-                format='full'  # Get full message including body
-            ).execute()
+            message = execute(self._get_request(
+                message_id, format, list(metadata_headers) if metadata_headers else None
+            ))
             
             return message
             
@@ -136,6 +223,131 @@ class GmailService:
             print(f"❌ Unexpected error: {e}")
             raise
     
+    def fetch_message_details_batch(self, message_ids, format='full', metadata_headers=None):
+        """
+        Fetch full message details for many message IDs.
+        
+        Uses Gmail batch requests, so N messages cost ceil(N / 100) HTTP
+        round-trips instead of N. When several batches are needed they are
+        sent concurrently (up to MAX_CONCURRENT_BATCHES), each on its own
+        connection. Messages that fail with a transient error (429 / 5xx)
+        are fetched again in a new batch, up to BATCH_RETRY_ROUNDS times.
+        
+        Args:
+            message_ids (list): Gmail message IDs
+            format (str): Gmail message format, as in fetch_message_details()
+            metadata_headers (list, optional): As in fetch_message_details()
+            
+        Returns:
+            dict: {message_id: message} for every message fetched
+                  successfully. Failed IDs are left out so callers can
+                  retry them with fetch_message_details().
+        """
+        messages = {}
+        pending = list(message_ids)
+        
+        for attempt in range(BATCH_RETRY_ROUNDS + 1):
+            retryable = []
+            
+            def on_response(request_id, response, exception):
+                if exception is None:
+                    messages[request_id] = response
+                elif (attempt < BATCH_RETRY_ROUNDS and isinstance(exception, HttpError)
+                      and getattr(exception.resp, 'status', None) in RETRY_STATUSES):
+                    retryable.append(request_id)
+                else:
+                    print(f"❌ Error fetching message {request_id}: {exception}")
+            
+            self._send_batches(pending, format, metadata_headers, on_response)
+            
+            if not retryable:
+                break
+            delay = BATCH_RETRY_DELAY * 2 ** attempt
+            print(f"   ⏳ {len(retryable)} message(s) rate limited, retrying in {delay:.0f}s...")
+            time.sleep(delay)
+            pending = retryable
+        
+        return messages
+    
+    def _send_batches(self, message_ids, format, metadata_headers, callback):
+        """
+        Fetch messages in batches of MAX_BATCH_SIZE, several at once.
+        
+        Args:
+            message_ids (list): Gmail message IDs
+            format (str): Gmail message format
+            metadata_headers (list): Headers to keep with format='metadata'
+            callback: Called as callback(message_id, response, exception)
+        """
+        chunks = [
+            message_ids[start:start + MAX_BATCH_SIZE]
+            for start in range(0, len(message_ids), MAX_BATCH_SIZE)
+        ]
+        
+        if len(chunks) <= 1:
+            for chunk in chunks:
+                self._execute_batch(chunk, format, metadata_headers, callback)
+            return
+        
+        # httplib2 connections are not thread-safe: give each batch its own
+        # (over HTTP/2 they all share one multiplexed connection)
+        def execute_on_new_connection(chunk):
+            self._execute_batch(chunk, format, metadata_headers, callback,
+                                http=authorized_http(self.credentials))
+        
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_BATCHES, len(chunks))) as pool:
+            list(pool.map(execute_on_new_connection, chunks))
+    
+    def _get_request(self, message_id, format, metadata_headers):
+        """
+        Build (without sending) a messages.get request.
+        
+        Args:
+            message_id (str): Gmail message ID
+            format (str): Gmail message format ('full' includes the body)
+            metadata_headers (list): Headers to keep with format='metadata',
+                                     or None for all
+            
+        Returns:
+            HttpRequest: Request for execute() or a batch
+        """
+        options = {}
+        if metadata_headers:
+            options['metadataHeaders'] = metadata_headers
+        if format != 'raw':
+            options['fields'] = MESSAGE_FIELDS
+        # Compact JSON; Google APIs indent responses by default
+        return self.service.users().messages().get(
+            userId='me',
+            id=message_id,
+            format=format,
+            prettyPrint=False,
+            **options
+        )
+    
+    def _execute_batch(self, message_ids, format, metadata_headers, callback, http=None):
+        """
+        Send one batch request of messages.get calls.
+        
+        Args:
+            message_ids (list): At most MAX_BATCH_SIZE Gmail message IDs
+            format (str): Gmail message format
+            metadata_headers (list): Headers to keep with format='metadata'
+            callback: Called as callback(message_id, response, exception)
+            http: Connection to send the batch on (None: the service's own)
+        """
+        batch = self.service.new_batch_http_request(callback=callback)
+        for message_id in message_ids:
+            batch.add(
+                self._get_request(message_id, format, metadata_headers),
+                request_id=message_id
+            )
+        
+        try:
+            batch.execute(http=http)
+        except Exception as e:
+            print(f"❌ Batch fetch failed: {e}")
+    
     def mark_as_read(self, message_id):
         """
         Mark an email as read by removing the UNREAD label.
@@ -151,11 +363,11 @@ class GmailService:
         """
         try:
             # Modify message to remove UNREAD label
-            self.service.users().messages().modify(
+            execute(self.service.users().messages().modify(
                 userId='me',
                 id=message_id,
                 body={'removeLabelIds': ['UNREAD']}
-            ).execute()
+            ))
             
             return True
             
@@ -166,19 +378,60 @@ class GmailService:
             print(f"❌ Unexpected error: {e}")
             return False
     
-    def get_message_count(self):
+    def mark_many_as_read(self, message_ids):
+        """
+        Mark several emails as read with messages.batchModify.
+        
+        One request per MAX_MODIFY_IDS messages instead of one per message.
+        
+        Args:
+            message_ids (list): Gmail message IDs
+            
+        Returns:
+            int: Number of messages marked as read
+        """
+        marked = 0
+        
+        for start in range(0, len(message_ids), MAX_MODIFY_IDS):
+            chunk = message_ids[start:start + MAX_MODIFY_IDS]
+            try:
+                execute(self.service.users().messages().batchModify(
+                    userId='me',
+                    body={'ids': chunk, 'removeLabelIds': ['UNREAD']}
+                ))
+                marked += len(chunk)
+                
+            except HttpError as error:
+                print(f"❌ Error marking {len(chunk)} message(s) as read: {error}")
+            except Exception as e:
+                print(f"❌ Unexpected error: {e}")
+        
+        return marked
+    
+    def get_message_count(self, refresh=False):
         """
         Get total count of unread messages in inbox.
         Useful for reporting and verification.
         
+        Reuses the resultSizeEstimate from the last
+        fetch_unread_message_ids() call (same query) when there is one, so
+        the count costs no extra API call.
+        
+        Args:
+            refresh (bool): Always query Gmail for a fresh count
+        
         Returns:
             int: Number of unread messages
         """
+        if self._last_list_result is not None and not refresh:
+            return self._last_list_result.get('resultSizeEstimate', 0)
+        
         try:
             results = self.service.users().messages().list(
                 userId='me',
                 q=config.GMAIL_QUERY
             ).execute()
+            self._last_list_result = results
             
             return results.get('resultSizeEstimate', 0)
             
@@ -0,0 +1,222 @@
+"""
+HTTP Transport Module
+Shares one HTTP/2 connection pool (httpx) across the Google API clients.
+"""
+
+import os
+import sys
+import socket
+import logging
+import threading
+from urllib.parse import urljoin
+
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT_DIR not in sys.path:
+    sys.path.append(_ROOT_DIR)
+import config
+
+import httplib2
+import google_auth_httplib2
+
+try:
+    import httpx
+    import h2  # noqa: F401 - required by httpx for http2=True
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+
+# httpx logs every response at INFO ("HTTP Request: POST ..."), one line per
+# API call under main's INFO root logger; shown only when LOG_LEVEL is DEBUG
+_log_level = getattr(config, 'LOG_LEVEL', 'INFO')
+if isinstance(_log_level, str):
+    _log_level = logging.getLevelName(_log_level.upper())
+if not (isinstance(_log_level, int) and _log_level <= logging.DEBUG):
+    for _name in ('httpx', 'httpcore'):
+        logging.getLogger(_name).setLevel(logging.WARNING)
+
+# Same default as googleapiclient's build_http()
+DEFAULT_TIMEOUT_SEC = 60
+
+# Idle connections kept open; all Google APIs live on a few hosts
+MAX_KEEPALIVE_CONNECTIONS = 20
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def _shared_client():
+    """Create (once) and return the process-wide httpx client."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = httpx.Client(
+                http2=True,
+                limits=httpx.Limits(max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS)
+            )
+        return _client
+
+
+class Http2Transport:
+    """
+    httplib2.Http stand-in that sends requests over a shared httpx client.
+
+    Implements the parts of the httplib2.Http interface googleapiclient and
+    google_auth_httplib2 use: request() returning (httplib2.Response, bytes)
+    plus the timeout / redirect attributes. httpx.Client is thread-safe, so
+    one instance can serve every service and thread, and requests to the
+    same host are multiplexed over one HTTP/2 connection. Client
+    certificates are not supported; setups using them stay on httplib2
+    (see _use_http2()).
+    """
+
+    def __init__(self, timeout=None):
+        """
+        Initialize the transport.
+
+        Args:
+            timeout (float, optional): Per-request timeout in seconds.
+                                      Defaults to the socket default, or 60s
+        """
+        self.timeout = timeout or socket.getdefaulttimeout() or DEFAULT_TIMEOUT_SEC
+        self.follow_redirects = True
+        # 308 is used for resumable uploads, not redirects (as in build_http)
+        self.redirect_codes = frozenset((300, 301, 302, 303, 307))
+        self.connections = {}
+        self._client = _shared_client()
+
+    def request(self, uri, method='GET', body=None, headers=None,
+                redirections=5, connection_type=None):
+        """
+        Send one HTTP request.
+
+        Args:
+            uri (str): Absolute URL
+            method (str): HTTP method
+            body (str | bytes, optional): Request body
+            headers (dict, optional): Request headers
+            redirections (int): Maximum redirects to follow
+            connection_type: Ignored (httplib2 compatibility)
+
+        Returns:
+            tuple: (httplib2.Response, bytes content)
+        """
+        try:
+            response = self._client.request(
+                method,
+                uri,
+                content=body,
+                headers=headers,
+                timeout=self.timeout
+            )
+            # Follow redirects ourselves so redirect_codes is honoured
+            while (self.follow_redirects and redirections > 0
+                   and response.status_code in self.redirect_codes
+                   and 'location' in response.headers):
+                redirections -= 1
+                redirect_method = 'GET' if response.status_code == 303 else method
+                response = self._client.request(
+                    redirect_method,
+                    urljoin(str(response.url), response.headers['location']),
+                    content=None if redirect_method == 'GET' else body,
+                    headers=headers,
+                    timeout=self.timeout
+                )
+        except httpx.TimeoutException as e:
+            # Exception types googleapiclient already retries on
+            raise socket.timeout(str(e)) from e
+        except (httpx.NetworkError, httpx.RemoteProtocolError) as e:
+            raise ConnectionError(str(e)) from e
+
+        info = dict(response.headers)
+        # Body is already decompressed; do not advertise the original encoding
+        info.pop('content-encoding', None)
+        info['status'] = str(response.status_code)
+        result = httplib2.Response(info)
+        result.reason = response.reason_phrase
+        return result, response.content
+
+    def close(self):
+        """Connections belong to the shared client; nothing to close here."""
+        pass
+
+
+def _client_cert_requested():
+    """
+    Check whether googleapiclient would set up mutual TLS.
+
+    build() only adds the client certificate to connections it creates
+    itself, so the services must not be handed an Http2Transport then.
+
+    Returns:
+        bool: True if a client certificate should be used
+    """
+    try:
+        from google.auth.transport import mtls
+        if hasattr(mtls, 'should_use_client_cert'):
+            return mtls.should_use_client_cert()
+    except ImportError:
+        pass
+    return os.environ.get('GOOGLE_API_USE_CLIENT_CERTIFICATE', 'false').lower() == 'true'
+
+
+def _use_http2():
+    """Whether to send requests over the shared HTTP/2 client."""
+    return (HTTPX_AVAILABLE and getattr(config, 'USE_HTTP2', True)
+            and not _client_cert_requested())
+
+
+def authorized_http(credentials):
+    """
+    Create a new authorized connection object for one thread.
+    
+    Uses the shared HTTP/2 client when available (see build_kwargs()), so
+    a fresh object per thread costs no new connection; otherwise a fresh
+    httplib2 connection.
+    
+    Args:
+        credentials: OAuth 2.0 credentials object
+        
+    Returns:
+        google_auth_httplib2.AuthorizedHttp: Connection for request(s)
+    """
+    if _use_http2():
+        return google_auth_httplib2.AuthorizedHttp(credentials, http=Http2Transport())
+    return google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+
+
+def build_kwargs(credentials):
+    """
+    Get the transport arguments for googleapiclient.discovery.build().
+
+    Uses the shared HTTP/2 client when httpx (with h2) is installed,
+    config.USE_HTTP2 is not False and no client certificate (mutual TLS) is
+    requested; otherwise lets build() create its usual httplib2 connection
+    from the credentials.
+
+    Args:
+        credentials: OAuth 2.0 credentials object
+
+    Returns:
+        dict: {'http': AuthorizedHttp} or {'credentials': credentials}
+    """
+    if _use_http2():
+        return {'http': google_auth_httplib2.AuthorizedHttp(credentials, http=Http2Transport())}
+    return {'credentials': credentials}
+
+
+if __name__ == "__main__":
+    """Show which transport the services will use."""
+    print("=" * 60)
+    print("Testing HTTP Transport")
+    print("=" * 60)
+
+    if HTTPX_AVAILABLE:
+        print("\n✅ httpx with HTTP/2 available - services share one connection pool")
+        response, content = Http2Transport().request('https://www.googleapis.com/discovery/v1/apis')
+        print(f"   Discovery status: {response.status} ({len(content)} bytes)")
+    else:
+        print("\n⚠️  httpx/h2 not installed - services use httplib2")
+
+    print("\n" + "=" * 60)
+    print("✅ HTTP Transport Test Complete!")
+    print("=" * 60)
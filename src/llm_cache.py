@@ -0,0 +1,226 @@
+"""
+LLM Cache Module
+Persists parsed Gemini results keyed by a hash of the prompt inputs.
+"""
+
+import os
+import sys
+import time
+import atexit
+import shelve
+import hashlib
+import threading
+from collections import OrderedDict
+
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT_DIR not in sys.path:
+    sys.path.append(_ROOT_DIR)
+import config
+
+# Default location: .llm_cache/ next to config.py
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    '.llm_cache'
+)
+
+# Results kept in memory per cache; least recently used are dropped first
+MEMORY_ENTRIES = getattr(config, 'LLM_CACHE_MEMORY_ENTRIES', 4096)
+
+# On-disk bounds: entries not used for MAX_AGE_DAYS are dropped, then the
+# oldest beyond MAX_ENTRIES. Checked when a cache is opened, at most once
+# per TRIM_INTERVAL_SEC since reading every entry is not free.
+MAX_ENTRIES = getattr(config, 'LLM_CACHE_MAX_ENTRIES', 20000)
+MAX_AGE_DAYS = getattr(config, 'LLM_CACHE_MAX_AGE_DAYS', 30)
+TRIM_INTERVAL_SEC = 24 * 60 * 60
+
+# A disk hit rewrites the entry's timestamp only when it is this old, so
+# hits rarely cost a write
+_TOUCH_AFTER_SEC = 24 * 60 * 60
+
+_TRIMMED_AT_KEY = '__trimmed_at__'
+
+
+def _is_entry(stored):
+    """Whether a shelf value is a (saved_at, value) entry."""
+    return (isinstance(stored, tuple) and len(stored) == 2
+            and isinstance(stored[0], float))
+
+
+def content_key(*parts):
+    """
+    Build a cache key from the inputs that determine an LLM result.
+
+    Args:
+        *parts (str): Prompt inputs (model name, prompt template, subject,
+                      content, ...); include the template so editing a
+                      prompt does not serve results of the old one
+
+    Returns:
+        str: 32-character hex digest
+    """
+    joined = '\x1f'.join(str(part) for part in parts)
+    return hashlib.blake2b(joined.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class LLMCache:
+    """
+    Two-level cache for parsed LLM results.
+
+    Lookups hit an in-process LRU first and fall back to a shelve file on
+    disk, so identical emails skip the Gemini round-trip both within a run
+    and across runs. Values should be the parsed result (e.g. a dict), not
+    the raw response text, so hits also skip JSON parsing.
+
+    Both levels are bounded: MEMORY_ENTRIES results in memory, and on disk
+    entries are stored with a timestamp and trimmed by age and count (see
+    MAX_ENTRIES / MAX_AGE_DAYS).
+    """
+
+    def __init__(self, name, cache_dir=None):
+        """
+        Initialize the cache.
+
+        Args:
+            name (str): Cache file name (one per feature, e.g. 'actions')
+            cache_dir (str, optional): Directory for cache files.
+                                      Defaults to config.LLM_CACHE_DIR
+        """
+        self.name = name
+        self.cache_dir = cache_dir or getattr(config, 'LLM_CACHE_DIR', DEFAULT_CACHE_DIR)
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._shelf = None
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._shelf = shelve.open(os.path.join(self.cache_dir, name))
+            atexit.register(self.close)
+        except Exception as e:
+            print(f"⚠️  LLM cache '{name}' unavailable on disk, using memory only: {e}")
+            self._shelf = None
+
+        if self._shelf is not None:
+            try:
+                self._trim_shelf()
+            except Exception as e:
+                print(f"⚠️  Failed to trim LLM cache '{name}': {e}")
+
+    def _trim_shelf(self):
+        """Drop expired, unreadable and excess entries from the disk store."""
+        shelf = self._shelf
+        now = time.time()
+        if now - shelf.get(_TRIMMED_AT_KEY, 0) < TRIM_INTERVAL_SEC:
+            return
+
+        cutoff = now - MAX_AGE_DAYS * 24 * 60 * 60
+        kept = []  # (saved_at, key)
+        for key in list(shelf.keys()):
+            if key == _TRIMMED_AT_KEY:
+                continue
+            try:
+                stored = shelf[key]
+            except Exception:
+                stored = None
+            # Entries written before timestamps were stored are dropped too
+            if not _is_entry(stored) or stored[0] < cutoff:
+                del shelf[key]
+            else:
+                kept.append((stored[0], key))
+
+        if len(kept) > MAX_ENTRIES:
+            kept.sort()
+            for _, key in kept[:len(kept) - MAX_ENTRIES]:
+                del shelf[key]
+
+        shelf[_TRIMMED_AT_KEY] = now
+
+    def _remember(self, key, value):
+        """Put a value in the memory LRU (lock held)."""
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+        if len(self._memory) > MEMORY_ENTRIES:
+            self._memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        Look up a cached result.
+
+        Args:
+            key (str): Key from content_key()
+
+        Returns:
+            Cached value, or None on miss
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+
+            if self._shelf is not None:
+                try:
+                    stored = self._shelf.get(key)
+                except Exception:
+                    stored = None
+                if not _is_entry(stored):
+                    return None
+
+                saved_at, value = stored
+                now = time.time()
+                if now - saved_at > _TOUCH_AFTER_SEC:
+                    # Refresh so entries in use are not trimmed as old
+                    try:
+                        self._shelf[key] = (now, value)
+                    except Exception:
+                        pass
+                self._remember(key, value)
+                return value
+
+        return None
+
+    def set(self, key, value):
+        """
+        Store a result in memory and on disk.
+
+        Args:
+            key (str): Key from content_key()
+            value: Picklable parsed result
+        """
+        with self._lock:
+            self._remember(key, value)
+            if self._shelf is not None:
+                try:
+                    self._shelf[key] = (time.time(), value)
+                except Exception as e:
+                    print(f"      ⚠️  Failed to write LLM cache entry: {e}")
+
+    def close(self):
+        """Flush and close the on-disk store."""
+        with self._lock:
+            if self._shelf is not None:
+                try:
+                    self._shelf.close()
+                finally:
+                    self._shelf = None
+
+
+if __name__ == "__main__":
+    """Test the LLM cache."""
+    print("=" * 60)
+    print("Testing LLM Cache")
+    print("=" * 60)
+
+    cache = LLMCache('selftest')
+    key = content_key(config.GEMINI_MODEL, 'Template {subject} {content}', 'Subject', 'Body')
+
+    print(f"\nKey: {key}")
+    print(f"Before set: {cache.get(key)}")
+    cache.set(key, {'actions': 'None', 'due_date': 'None'})
+    print(f"After set:  {cache.get(key)}")
+    cache.close()
+
+    reopened = LLMCache('selftest')
+    print(f"Reopened:   {reopened.get(key)}")
+
+    print("\n" + "=" * 60)
+    print("✅ LLM Cache Test Complete!")
+    print("=" * 60)
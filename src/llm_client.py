@@ -0,0 +1,92 @@
+"""
+LLM Client Module
+One Gemini model object per model name, shared by every service.
+"""
+
+import os
+import sys
+import threading
+from importlib.util import find_spec
+
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT_DIR not in sys.path:
+    sys.path.append(_ROOT_DIR)
+import config
+
+_MODELS = {}
+_configured_key = None
+_LOCK = threading.Lock()
+
+
+def gemini_available():
+    """
+    Check whether google-generativeai is installed, without importing it.
+
+    Returns:
+        bool: True if get_model() can load the SDK
+    """
+    try:
+        return find_spec('google.generativeai') is not None
+    except ImportError:
+        # No 'google' package at all
+        return False
+
+
+def get_model(api_key=None, model_name=None):
+    """
+    Get the process-wide Gemini model.
+
+    genai.configure() is called once per API key instead of once per
+    service, and every service sends its requests through the same model
+    object (and so the same SDK client and connections). Pair it with
+    rate_limiter.get_rate_limiter(model_name) for the shared quota.
+
+    Args:
+        api_key (str, optional): Gemini API key. Defaults to config.GEMINI_API_KEY
+        model_name (str, optional): Gemini model. Defaults to config.GEMINI_MODEL
+
+    Returns:
+        genai.GenerativeModel: Shared model
+
+    Raises:
+        ImportError: If google-generativeai is not installed
+    """
+    global _configured_key
+
+    # Imported on demand: the Gemini SDK (protobuf, grpc) is slow to load
+    import google.generativeai as genai
+
+    api_key = api_key or config.GEMINI_API_KEY
+    model_name = model_name or config.GEMINI_MODEL
+
+    with _LOCK:
+        if api_key != _configured_key:
+            genai.configure(api_key=api_key)
+            _configured_key = api_key
+            # Models built under the previous key would keep using it
+            _MODELS.clear()
+
+        model = _MODELS.get(model_name)
+        if model is None:
+            model = genai.GenerativeModel(model_name)
+            _MODELS[model_name] = model
+        return model
+
+
+if __name__ == "__main__":
+    """Check that services get the same model object."""
+    print("=" * 60)
+    print("Testing LLM Client")
+    print("=" * 60)
+
+    try:
+        first = get_model()
+        second = get_model()
+        print(f"\nModel: {config.GEMINI_MODEL}")
+        print(f"Shared: {'✅ yes' if first is second else '❌ no'}")
+    except ImportError:
+        print("\n⚠️  google-generativeai not installed")
+
+    print("\n" + "=" * 60)
+    print("✅ LLM Client Test Complete!")
+    print("=" * 60)
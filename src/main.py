@@ -6,9 +6,15 @@ Includes: Categorization, Summarization, Action Items, Attachments,
 
 import sys
 import os
-import time
+import logging
+from collections import Counter
+from operator import itemgetter
+from logging.handlers import MemoryHandler
+from concurrent.futures import ThreadPoolExecutor
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT_DIR not in sys.path:
+    sys.path.append(_ROOT_DIR)
 
 import config
 from auth import authenticate
@@ -16,22 +22,126 @@ from gmail_service import GmailService
 from sheets_service import SheetsService
 from email_parser import parse_email
 from state_manager import StateManager
-from categorizer import categorize_email, get_importance
+from categorizer import categorize_email, get_importance, sort_emails_by_importance
 from summarizer import EmailSummarizer
 
-# Phase 1 imports
-from action_extractor import ActionExtractor
-from attachment_handler import AttachmentHandler
-from analytics import EmailAnalytics
+# Phase 1 / Phase 2 services are imported in Step 2, only when enabled
 
-# Phase 2 imports
-from sentiment_analyzer import SentimentAnalyzer
-from auto_responder import AutoResponder
-from calendar_service import CalendarService
+# Minimum category importance for each Gemini-backed feature. Emails below
+# it get a cheap placeholder instead of an LLM call (set to 0 to run all).
+SUMMARY_MIN_IMPORTANCE = getattr(config, 'SUMMARY_MIN_IMPORTANCE', 3)
+ACTIONS_MIN_IMPORTANCE = getattr(config, 'ACTIONS_MIN_IMPORTANCE', 3)
+SENTIMENT_MIN_IMPORTANCE = getattr(config, 'SENTIMENT_MIN_IMPORTANCE', 2)
+CALENDAR_MIN_IMPORTANCE = getattr(config, 'CALENDAR_MIN_IMPORTANCE', 3)
+
+# Attachments of less important emails are listed but not downloaded
+ATTACHMENT_MIN_IMPORTANCE = getattr(config, 'ATTACHMENT_MIN_IMPORTANCE', 3)
+
+# Written to the sheet for a feature that was gated off
+SKIPPED = 'Skipped'
+
+# Results for features turned off in config (what each service returns
+# when its ENABLE_* flag is off)
+NO_ACTIONS = {'actions': 'None', 'due_date': 'None'}
+NO_ATTACHMENTS = {
+    'has_attachments': 'No',
+    'attachment_names': 'None',
+    'attachment_count': 0,
+    'attachment_links': 'None'
+}
+NEUTRAL_SENTIMENT = {'sentiment': 'neutral', 'urgency_score': 0.5}
+
+# Row fields taken straight from a result dict, fetched together in C
+_PARSED_COLUMNS = itemgetter('message_id', 'from', 'subject', 'date')
+_ACTION_COLUMNS = itemgetter('actions', 'due_date')
+
+# Queued rows are written to Sheets (and state saved) every this many
+# emails, so a crash mid-run loses at most this much work
+SHEETS_FLUSH_EVERY = getattr(config, 'SHEETS_FLUSH_EVERY', 25)
+
+# Per-email output is buffered and written once per email (warnings are
+# written immediately); LOG_BUFFER_LINES bounds the buffer in between.
+# Display truncation uses %.Ns, so it only happens for lines actually written
+LOG_BUFFER_LINES = 32
+
+log = logging.getLogger('mailsync')
+
+# False: leave out the per-email detail lines (warnings and errors are kept)
+VERBOSE = getattr(config, 'VERBOSE', True)
+
+
+def _emails_at_least(emails, min_importance):
+    """
+    Select the emails important enough for a gated feature.
+    
+    Args:
+        emails (list): (message_id, parsed, importance) tuples
+        min_importance (int): Feature threshold
+        
+    Returns:
+        tuple: (message IDs, parsed emails) of the selected emails
+    """
+    selected = [(msg_id, parsed) for msg_id, parsed, importance in emails
+                if importance >= min_importance]
+    return [msg_id for msg_id, _ in selected], [parsed for _, parsed in selected]
+
+
+def _start_write(pool, sheets, rows, message_ids):
+    """
+    Start appending queued rows to Sheets on the writer thread.
+    
+    Args:
+        pool (ThreadPoolExecutor): Single-thread Sheets writer
+        sheets (SheetsService): Sheets service
+        rows (list): Sheet rows
+        message_ids (list): Message ID of each row
+        
+    Returns:
+        tuple: (future, message_ids) for _finish_write()
+    """
+    log.info("\n📤 Appending %d row(s) to Sheets...", len(rows))
+    return pool.submit(sheets.append_rows, rows), message_ids
+
+
+def _finish_write(state, write):
+    """
+    Wait for a write from _start_write() and record its emails as processed.
+    
+    Only emails whose row landed in the sheet are recorded; the rest are
+    retried next run.
+    
+    Args:
+        state (StateManager): State manager
+        write (tuple): (future, message_ids) from _start_write()
+        
+    Returns:
+        list: Message IDs whose row was appended
+    """
+    future, message_ids = write
+    appended = future.result()
+    written_ids = message_ids[:appended]
+    state.mark_as_processed_many(written_ids)
+    
+    if appended < len(message_ids):
+        log.warning("   ⚠️  Failed to append %d row(s) to Sheets (will retry next run)",
+                    len(message_ids) - appended)
+    return written_ids
 
 
 def main():
     """Enhanced main workflow with Phase 1 + Phase 2 features."""
+    # Module loggers print like the rest of the console output; per-email
+    # DEBUG detail is only formatted when LOG_LEVEL asks for it
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter('%(message)s'))
+    log_buffer = MemoryHandler(LOG_BUFFER_LINES, flushLevel=logging.WARNING, target=console)
+    logging.basicConfig(
+        level=getattr(config, 'LOG_LEVEL', 'INFO'),
+        handlers=[log_buffer]
+    )
+    if not VERBOSE:
+        log.setLevel(logging.WARNING)
+    
     print("=" * 70)
     print("📧 Gmail to Google Sheets Automation (Full Featured)")
     print("=" * 70)
@@ -52,19 +162,59 @@ def main():
         print("🔧 Step 2: Initializing services...")
         print("-" * 70)
         
+        # API clients are built concurrently; each builds its own client
+        # from the already-refreshed credentials, and they are only used
+        # from this thread afterwards
+        if config.ENABLE_CALENDAR_INTEGRATION:
+            from calendar_service import CalendarService
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            gmail_future = pool.submit(GmailService, credentials)
+            sheets_future = pool.submit(SheetsService, credentials)
+            calendar_future = (
+                pool.submit(CalendarService, credentials, use_llm=True)
+                if config.ENABLE_CALENDAR_INTEGRATION else None
+            )
+        
         # Core services
-        gmail = GmailService(credentials)
-        sheets = SheetsService(credentials)
-        state = StateManager()
+        gmail = gmail_future.result()
+        sheets = sheets_future.result()
+        state = StateManager(verbose=VERBOSE)
         summarizer = EmailSummarizer()
         
-        action_extractor = ActionExtractor(use_llm=True)
-        attachment_handler = AttachmentHandler(gmail_service=gmail)
-        analytics = EmailAnalytics(sheets_service=sheets, state_manager=state)
+        # Optional features: a disabled feature's module (and its SDK
+        # imports) is never loaded, and its service stays None
+        action_extractor = None
+        if config.ENABLE_ACTION_EXTRACTION:
+            from action_extractor import ActionExtractor
+            action_extractor = ActionExtractor(use_llm=True)
         
-        sentiment_analyzer = SentimentAnalyzer(use_llm=True)
-        auto_responder = AutoResponder(gmail_service=gmail)
-        calendar_service = CalendarService(credentials, use_llm=True)
+        attachment_handler = None
+        if config.ENABLE_ATTACHMENT_HANDLING:
+            from attachment_handler import AttachmentHandler
+            attachment_handler = AttachmentHandler(gmail_service=gmail)
+        
+        analytics = None
+        if config.ENABLE_ANALYTICS:
+            from analytics import EmailAnalytics
+            analytics = EmailAnalytics(sheets_service=sheets, state_manager=state)
+        
+        sentiment_analyzer = None
+        if config.ENABLE_SENTIMENT_ANALYSIS:
+            from sentiment_analyzer import SentimentAnalyzer
+            sentiment_analyzer = SentimentAnalyzer(use_llm=True)
+        
+        # Summary, actions and sentiment in one Gemini request per email
+        email_analyzer = None
+        if action_extractor and sentiment_analyzer:
+            from email_analyzer import EmailAnalyzer
+            email_analyzer = EmailAnalyzer(summarizer, action_extractor, sentiment_analyzer)
+        
+        auto_responder = None
+        if config.ENABLE_AUTO_RESPONSE:
+            from auto_responder import AutoResponder
+            auto_responder = AutoResponder(gmail_service=gmail)
+        
+        calendar_service = calendar_future.result() if calendar_future else None
         
         print()
         
@@ -104,6 +254,13 @@ def main():
         print("🔍 Step 5: Filtering out already-processed emails...")
         print("-" * 70)
         
+        # Cold start (first run, or the state file was lost): the sheet is
+        # the record of what was processed, read once instead of per email
+        if not state.get_stats()['message_count']:
+            known = state.merge(sheets.get_all_message_ids())
+            if known:
+                print(f"   📋 Recovered {known} processed ID(s) from the sheet")
+        
         new_message_ids = state.filter_new_messages(all_message_ids)
         
         if not new_message_ids:
@@ -128,37 +285,43 @@ def main():
         
         email_categories = []
         
+        # One batched HTTP call per 100 messages; anything missing from the
+        # batch result is fetched individually below
+        fetched_messages = gmail.fetch_message_details_batch(new_message_ids)
+        
         for msg_id in new_message_ids:
             try:
-                message = gmail.fetch_message_details(msg_id)
+                message = fetched_messages.get(msg_id)
+                if message is None:
+                    message = gmail.fetch_message_details(msg_id)
                 parsed = parse_email(message)
-                category = categorize_email(parsed)
+                # Gmail's own category labels come with the message
+                category = categorize_email(parsed, message.get('labelIds'))
                 email_categories.append((msg_id, category, parsed, message))
             except Exception as e:
                 print(f"   ⚠️  Error categorizing {msg_id}: {e}")
                 email_categories.append((msg_id, 'Other', None, None))
         
         # Sort by importance
-        sorted_emails = sorted(
-            email_categories,
-            key=lambda x: get_importance(x[1]),
-            reverse=True
-        )
+        sorted_emails = sort_emails_by_importance(email_categories)
         
         print(f"✅ Emails categorized and sorted by importance")
         print()
         
         # Display category breakdown
-        category_counts = {}
-        for _, category, _, _ in sorted_emails:
-            category_counts[category] = category_counts.get(category, 0) + 1
+        category_counts = Counter(category for _, category, _, _ in sorted_emails)
+        
+        # Looked up once per distinct category; reused below and in Step 7
+        importance_by_category = {
+            category: get_importance(category) for category in category_counts
+        }
         
         print("📊 Category Breakdown:")
-        for category in sorted(category_counts.keys(), 
-                              key=lambda c: get_importance(c), 
+        for category in sorted(category_counts,
+                              key=importance_by_category.__getitem__,
                               reverse=True):
             count = category_counts[category]
-            importance = get_importance(category)
+            importance = importance_by_category[category]
             print(f"   {category}: {count} email(s) [Priority: {importance}/5]")
         
         print()
@@ -166,18 +329,107 @@ def main():
         # =================================================================
         # Process Emails (FULL PIPELINE - Phase 1 + Phase 2)
         # =================================================================
+        log_buffer.flush()
         print("⚙️  Step 7: Processing emails (highest importance first)...")
         print("-" * 70)
         
-        processed_count = 0
         failed_count = 0
         
+        # Rows are written to Sheets in groups of SHEETS_FLUSH_EVERY, on a
+        # writer thread so each write overlaps the next emails' Gmail and
+        # Calendar calls. At most one write is in flight (the next checkpoint
+        # waits for it), and only that thread uses the Sheets client until
+        # the end of the loop.
+        pending_rows = []
+        pending_ids = []
+        sheets_pool = ThreadPoolExecutor(max_workers=1)
+        sheets_write = None
+        # Emails whose row was written; marked as read together at the end
+        written_ids = []
+        
+        # Each Gemini-backed feature only runs for emails at or above its
+        # importance threshold
+        batch_emails = [
+            (msg_id, parsed, importance_by_category[category])
+            for msg_id, category, parsed, _ in sorted_emails if parsed
+        ]
+        
+        # Attachment downloads are Gmail I/O that does not depend on Gemini:
+        # run them in the background while the Gemini requests below are
+        # made from this thread. Only the attachment workers (each on its
+        # own connection) use the Gmail client until they are joined,
+        # before the loop.
+        attachment_pool = ThreadPoolExecutor(max_workers=1)
+        attachments_future = None
+        if attachment_handler:
+            print("📎 Processing attachments (in the background)...")
+            attachments_future = attachment_pool.submit(
+                attachment_handler.process_attachments_batch,
+                [(message, msg_id) for msg_id, category, parsed, message in sorted_emails
+                 if parsed and importance_by_category[category] >= ATTACHMENT_MIN_IMPORTANCE]
+            )
+        
+        # Emails that need all three of summary, actions and sentiment get
+        # them from one combined request; the rest go feature by feature
+        fused_min = max(SUMMARY_MIN_IMPORTANCE, ACTIONS_MIN_IMPORTANCE, SENTIMENT_MIN_IMPORTANCE)
+        fused_emails = []
+        if email_analyzer and email_analyzer.use_llm:
+            fused_emails = [email for email in batch_emails if email[2] >= fused_min]
+            batch_emails = [email for email in batch_emails if email[2] < fused_min]
+        
+        summaries_by_id = {}
+        actions_by_id = {}
+        sentiments_by_id = {}
+        if fused_emails:
+            print(f"🤖 Analyzing {len(fused_emails)} email(s) (summary, actions, sentiment)...")
+            fused_results = email_analyzer.analyze_all_batch([parsed for _, parsed, _ in fused_emails])
+            for (msg_id, _, _), result in zip(fused_emails, fused_results):
+                summaries_by_id[msg_id] = result['summary']
+                actions_by_id[msg_id] = result['actions']
+                sentiments_by_id[msg_id] = result['sentiment']
+        
+        # Extract action items for all emails up front: one Gemini request
+        # per batch of emails instead of one per email
+        if action_extractor:
+            print("✅ Extracting action items (batched)...")
+            action_ids, action_parsed = _emails_at_least(batch_emails, ACTIONS_MIN_IMPORTANCE)
+            actions_by_id.update(zip(action_ids, action_extractor.extract_batch(action_parsed)))
+        
+        # Summaries and sentiment are one Gemini call per email and do not
+        # touch the Google API clients, so they overlap across emails. Sheets,
+        # Gmail and Calendar writes stay in the loop below, on this thread.
+        print("🤖 Generating summaries and analyzing sentiment...")
+        summary_ids, summary_parsed = _emails_at_least(batch_emails, SUMMARY_MIN_IMPORTANCE)
+        summaries_by_id.update(zip(summary_ids, summarizer.summarize_batch(summary_parsed)))
+        if sentiment_analyzer:
+            sentiment_ids, sentiment_parsed = _emails_at_least(batch_emails, SENTIMENT_MIN_IMPORTANCE)
+            sentiments_by_id.update(zip(sentiment_ids, sentiment_analyzer.analyze_batch(sentiment_parsed)))
+        
+        # Calendar event extraction is one Gemini call per candidate email;
+        # run them concurrently up front as well
+        event_emails = [
+            (msg_id, parsed) for msg_id, category, parsed, _ in sorted_emails
+            if calendar_service and parsed
+            and importance_by_category[category] >= CALENDAR_MIN_IMPORTANCE
+            and calendar_service.should_create_event(parsed, category)
+        ]
+        events_by_id = {}
+        if event_emails:
+            print(f"📅 Extracting calendar events for {len(event_emails)} email(s)...")
+            batch_events = calendar_service.extract_event_details_batch(
+                [parsed for _, parsed in event_emails]
+            )
+            events_by_id = {msg_id: event for (msg_id, _), event in zip(event_emails, batch_events)}
+        
+        attachments_by_id = attachments_future.result() if attachments_future else {}
+        attachment_pool.shutdown()
+        
         for i, (message_id, category, cached_parsed, message) in enumerate(sorted_emails, 1):
             try:
-                importance = get_importance(category)
+                importance = importance_by_category[category]
                 
-                print(f"\n[{i}/{len(sorted_emails)}] Processing: {message_id}")
-                print(f"   🏷️  Category: {category} | Importance: {importance}/5")
+                log.info("\n[%d/%d] Processing: %s", i, len(sorted_emails), message_id)
+                log.info("   🏷️  Category: %s | Importance: %d/5", category, importance)
                 
                 # Use cached data
                 if cached_parsed:
@@ -186,112 +438,170 @@ def main():
                     message = gmail.fetch_message_details(message_id)
                     parsed = parse_email(message)
                 
-                print(f"   📧 From: {parsed['from']}")
-                print(f"   📝 Subject: {parsed['subject'][:50]}...")
+                log.info("   📧 From: %s", parsed['from'])
+                log.info("   📝 Subject: %.50s...", parsed['subject'])
                 
                 # =========================================================
                 # AI Summary (Base Feature)
                 # =========================================================
-                print(f"   🤖 Generating summary...")
-                summary = summarizer.summarize_email(parsed)
-                print(f"   📄 Summary: {summary[:60]}...")
+                if importance < SUMMARY_MIN_IMPORTANCE:
+                    summary = parsed['subject'][:140]
+                else:
+                    summary = summaries_by_id.get(message_id)
+                    if summary is None:
+                        log.info("   🤖 Generating summary...")
+                        summary = summarizer.summarize_email(parsed)
+                log.info("   📄 Summary: %.60s...", summary)
                 
                 # =========================================================
                 # Extract Action Items
                 # =========================================================
-                print(f"   ✅ Extracting action items...")
-                actions = action_extractor.extract(parsed)
-                if actions['actions'] != 'None':
-                    print(f"   📋 Actions: {actions['actions'][:50]}...")
+                if action_extractor is None:
+                    actions = NO_ACTIONS
+                elif importance < ACTIONS_MIN_IMPORTANCE:
+                    actions = {'actions': SKIPPED, 'due_date': 'None'}
+                else:
+                    actions = actions_by_id.get(message_id)
+                    if actions is None:
+                        log.info("   ✅ Extracting action items...")
+                        actions = action_extractor.extract(parsed)
+                if actions['actions'] not in ('None', SKIPPED):
+                    log.info("   📋 Actions: %.50s...", actions['actions'])
                     if actions['due_date'] != 'None':
-                        print(f"   📅 Due: {actions['due_date']}")
+                        log.info("   📅 Due: %s", actions['due_date'])
                 
                 # =========================================================
                 # Process Attachments
                 # =========================================================
-                print(f"   📎 Processing attachments...")
-                attachments = attachment_handler.process_attachments(message, message_id)
+                if attachment_handler is None:
+                    attachments = NO_ATTACHMENTS
+                elif importance < ATTACHMENT_MIN_IMPORTANCE:
+                    attachments = attachment_handler.process_attachments(message, message_id, download=False)
+                else:
+                    attachments = attachments_by_id.get(message_id)
+                    if attachments is None:
+                        log.info("   📎 Processing attachments...")
+                        attachments = attachment_handler.process_attachments(message, message_id)
                 if attachments['has_attachments'] == 'Yes':
-                    print(f"   📎 Found {attachments['attachment_count']} attachment(s): {attachments['attachment_names'][:50]}...")
+                    log.info("   📎 Found %d attachment(s): %.50s...",
+                             attachments['attachment_count'], attachments['attachment_names'])
                 
                 # =========================================================
                 # Sentiment Analysis
                 # =========================================================
-                print(f"   😊 Analyzing sentiment...")
-                sentiment = sentiment_analyzer.analyze(parsed)
-                print(f"   💭 Sentiment: {sentiment['sentiment']} | Urgency: {sentiment['urgency_score']}")
+                if sentiment_analyzer is None:
+                    sentiment = NEUTRAL_SENTIMENT
+                elif importance < SENTIMENT_MIN_IMPORTANCE:
+                    sentiment = {'sentiment': SKIPPED, 'urgency_score': SKIPPED}
+                else:
+                    sentiment = sentiments_by_id.get(message_id)
+                    if sentiment is None:
+                        log.info("   😊 Analyzing sentiment...")
+                        sentiment = sentiment_analyzer.analyze(parsed)
+                log.info("   💭 Sentiment: %s | Urgency: %s", sentiment['sentiment'], sentiment['urgency_score'])
                 
                 # =========================================================
                 # Auto-Response
                 # =========================================================
-                should_respond, response_type = auto_responder.should_respond(parsed, category)
                 response_sent = 'No'
                 response_type_str = 'None'
                 
+                if auto_responder is None:
+                    should_respond = False
+                else:
+                    should_respond, response_type = auto_responder.should_respond(parsed, category)
+                
                 if should_respond:
                     response_text = auto_responder.generate_response(parsed, response_type)
                     if auto_responder.send_response(message_id, parsed, response_text):
                         response_sent = 'Yes'
                         response_type_str = response_type
-                        print(f"   📧 Auto-response sent ({response_type})")
+                        log.info("   📧 Auto-response sent (%s)", response_type)
                 
                 # =========================================================
                 # Calendar Integration
                 # =========================================================
                 calendar_created = 'No'
                 
-                if calendar_service.should_create_event(parsed, category):
-                    print(f"   📅 Extracting calendar event...")
+                if calendar_service is None:
+                    event_details = None
+                elif importance < CALENDAR_MIN_IMPORTANCE:
+                    calendar_created = SKIPPED
+                    event_details = None
+                elif message_id in events_by_id:
+                    event_details = events_by_id[message_id]
+                elif calendar_service.should_create_event(parsed, category):
+                    log.info("   📅 Extracting calendar event...")
                     event_details = calendar_service.extract_event_details(parsed)
-                    
-                    if event_details:
-                        event_link = calendar_service.create_event(event_details)
-                        if event_link and event_link != 'Failed':
-                            calendar_created = 'Yes' if event_link != 'DryRun' else 'DryRun'
-                            print(f"   📅 Calendar event: {event_details['title'][:40]}...")
+                else:
+                    event_details = None
+                
+                if event_details:
+                    event_link = calendar_service.create_event(event_details)
+                    if event_link and event_link != 'Failed':
+                        calendar_created = 'Yes' if event_link != 'DryRun' else 'DryRun'
+                        log.info("   📅 Calendar event: %.40s...", event_details['title'])
                 
+                # Column order matches config.SHEET_HEADERS
                 row = [
-                    parsed['message_id'],                  
-                    parsed['from'],                        
-                    parsed['subject'],                     
-                    parsed['date'],                        
-                    category,                              
-                    str(importance),                       
-                    summary,                               
-                    parsed['content'],                     
-                    actions['actions'],                     
-                    actions['due_date'],                    
-                    attachments['has_attachments'],         
-                    attachments['attachment_names'],        
-                    str(attachments['attachment_count']),   
-                    attachments['attachment_links'],        
-                    sentiment['sentiment'],                 
-                    str(sentiment['urgency_score']),        
-                    response_sent,                          
-                    response_type_str,                      
-                    calendar_created                        
+                    *_PARSED_COLUMNS(parsed),
+                    category,
+                    str(importance),
+                    summary,
+                    parsed['content'],
+                    *_ACTION_COLUMNS(actions),
+                    attachments['has_attachments'],
+                    attachments['attachment_names'],
+                    str(attachments['attachment_count']),
+                    attachments['attachment_links'],
+                    sentiment['sentiment'],
+                    str(sentiment['urgency_score']),
+                    response_sent,
+                    response_type_str,
+                    calendar_created
                 ]
                 
-                # Append to Sheets
-                success = sheets.append_row(row)
-                
-                if success:
-                    state.mark_as_processed(message_id)
-                    gmail.mark_as_read(message_id)
-                    print(f"   ✅ Successfully processed and marked as read")
-                    processed_count += 1
-                else:
-                    print(f"   ⚠️  Failed to append to Sheets (will retry next run)")
-                    failed_count += 1
-                
-                # Rate limiting for Gemini API
-                if i < len(sorted_emails):
-                    time.sleep(4)  # 15 req/min for Gemini Pro
+                pending_rows.append(row)
+                pending_ids.append(message_id)
+                log.info("   ✅ Processed (queued for Sheets)")
                 
             except Exception as e:
-                print(f"   ❌ Error processing email: {e}")
+                log.error("   ❌ Error processing email: %s", e)
                 failed_count += 1
                 continue
+            finally:
+                log_buffer.flush()
+            
+            # Checkpoint: write what is queued and save state (the saved
+            # state keeps the next run from repeating these emails even if
+            # this one stops before marking them as read)
+            if len(pending_rows) >= SHEETS_FLUSH_EVERY:
+                if sheets_write:
+                    written = _finish_write(state, sheets_write)
+                    written_ids.extend(written)
+                    failed_count += len(sheets_write[1]) - len(written)
+                    state.save_state()
+                sheets_write = _start_write(sheets_pool, sheets, pending_rows, pending_ids)
+                pending_rows = []
+                pending_ids = []
+        
+        # The writer runs in submission order, so the last rows can be queued
+        # behind the write still in flight
+        last_writes = [sheets_write] if sheets_write else []
+        if pending_rows:
+            last_writes.append(_start_write(sheets_pool, sheets, pending_rows, pending_ids))
+        for write in last_writes:
+            written = _finish_write(state, write)
+            written_ids.extend(written)
+            failed_count += len(write[1]) - len(written)
+        sheets_pool.shutdown()
+        log_buffer.flush()
+        
+        # One batchModify per 1000 emails for the whole run
+        processed_count = len(written_ids)
+        if written_ids:
+            marked = gmail.mark_many_as_read(written_ids)
+            print(f"   ✅ Marked {marked} email(s) as read")
         
         print()
         
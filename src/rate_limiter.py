@@ -0,0 +1,115 @@
+"""
+Rate Limiter Module
+Token-bucket limiting for Gemini requests, shared by every service.
+"""
+
+import os
+import sys
+import time
+import threading
+
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT_DIR not in sys.path:
+    sys.path.append(_ROOT_DIR)
+import config
+
+# Gemini free-tier quota
+DEFAULT_REQUESTS_PER_MINUTE = 15
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Holds up to `burst` tokens and refills continuously at
+    rate_per_min / 60 tokens per second. acquire() only sleeps when the
+    bucket is empty, so time a caller spends on its own request counts
+    towards the interval and is not waited again.
+    """
+
+    def __init__(self, rate_per_min, burst=None):
+        """
+        Initialize the bucket (full).
+
+        Args:
+            rate_per_min (float): Sustained requests per minute
+            burst (int, optional): Bucket size. Defaults to 1: any 60s
+                                   window then sees at most
+                                   burst - 1 + rate_per_min requests, so a
+                                   larger burst can exceed a per-minute quota
+        """
+        self.rate = rate_per_min / 60.0
+        self.capacity = burst if burst is not None else 1
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n=1):
+        """
+        Take n tokens, sleeping until they are available.
+
+        Each caller reserves its tokens under the lock and sleeps outside
+        it, so concurrent callers queue up one refill interval apart.
+
+        Args:
+            n (int): Tokens to take (requests about to be made)
+
+        Returns:
+            float: Seconds slept
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= n
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+_BUCKETS = {}
+_BUCKETS_LOCK = threading.Lock()
+
+
+def get_rate_limiter(model_name):
+    """
+    Get the process-wide bucket for a Gemini model.
+
+    Quotas are per model, so every service calling the same model shares
+    one bucket.
+
+    Args:
+        model_name (str): Gemini model name (e.g. config.GEMINI_MODEL)
+
+    Returns:
+        TokenBucket: Shared limiter for that model
+    """
+    with _BUCKETS_LOCK:
+        bucket = _BUCKETS.get(model_name)
+        if bucket is None:
+            bucket = TokenBucket(
+                getattr(config, 'GEMINI_REQUESTS_PER_MINUTE', DEFAULT_REQUESTS_PER_MINUTE),
+                getattr(config, 'GEMINI_BURST', None)
+            )
+            _BUCKETS[model_name] = bucket
+        return bucket
+
+
+if __name__ == "__main__":
+    """Test the token bucket."""
+    print("=" * 60)
+    print("Testing Rate Limiter")
+    print("=" * 60)
+
+    bucket = TokenBucket(rate_per_min=120, burst=3)  # 2 tokens/second
+
+    start = time.monotonic()
+    for i in range(6):
+        waited = bucket.acquire()
+        print(f"Request {i + 1}: waited {waited:.2f}s (t={time.monotonic() - start:.2f}s)")
+
+    print("\n" + "=" * 60)
+    print("✅ Rate Limiter Test Complete!")
+    print("=" * 60)
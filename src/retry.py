@@ -0,0 +1,86 @@
+"""
+Retry Module
+Exponential backoff for transient Google API errors (429 / 5xx).
+"""
+
+import time
+import random
+import logging
+import functools
+
+from googleapiclient.errors import HttpError
+
+log = logging.getLogger(__name__)
+
+# Rate limiting and server-side errors; anything else will fail again
+RETRY_STATUSES = frozenset((429, 500, 502, 503, 504))
+
+# The only safe retry for a request that is not idempotent: a 5xx can come
+# back after the server already applied it
+THROTTLE_STATUSES = frozenset((429,))
+
+
+def retry(max_attempts=5, base=0.5, max_delay=30, statuses=RETRY_STATUSES):
+    """
+    Decorator: retry a call on transient HttpErrors with exponential backoff.
+
+    Waits base * 2^n seconds (plus up to `base` of random jitter, capped at
+    max_delay) between attempts. HttpErrors with other statuses, other
+    exceptions, and the error from the last attempt are re-raised.
+
+    Args:
+        max_attempts (int): Total attempts, including the first
+        base (float): First delay in seconds
+        max_delay (float): Longest single delay in seconds
+        statuses (frozenset): HTTP statuses to retry
+
+    Returns:
+        function: Decorator
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(max_attempts):
+                try:
+                    return func(*args, **kwargs)
+                except HttpError as e:
+                    status = getattr(e.resp, 'status', None)
+                    if status not in statuses or attempt == max_attempts - 1:
+                        raise
+                    delay = min(max_delay, base * 2 ** attempt + random.uniform(0, base))
+                    log.warning("   ⏳ HTTP %s, retrying in %.1fs (%d/%d)...",
+                                status, delay, attempt + 1, max_attempts - 1)
+                    time.sleep(delay)
+        return wrapper
+    return decorator
+
+
+@retry()
+def execute(request):
+    """
+    Execute a googleapiclient request, retrying transient errors.
+
+    Args:
+        request: HttpRequest (e.g. service.users().messages().get(...))
+
+    Returns:
+        dict: Parsed response
+    """
+    return request.execute()
+
+
+@retry(statuses=THROTTLE_STATUSES)
+def execute_non_idempotent(request):
+    """
+    Execute a request that must not be repeated once the server got it.
+
+    For appends and other requests where a retry after a 5xx can apply the
+    change twice; only rate limiting (429) is retried.
+
+    Args:
+        request: HttpRequest (e.g. spreadsheets().values().append(...))
+
+    Returns:
+        dict: Parsed response
+    """
+    return request.execute()
@@ -9,8 +9,34 @@ import sys
 import os
 
 # Add parent directory to path to import config
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT_DIR not in sys.path:
+    sys.path.append(_ROOT_DIR)
 import config
+from http_transport import build_kwargs
+from retry import execute_non_idempotent
+
+# Rows per values().append call in append_rows(); each row can carry up to
+# ~45k characters of content, so this keeps requests well under the
+# Sheets payload limit
+APPEND_CHUNK_ROWS = 100
+
+
+def _column_letter(number):
+    """
+    Convert a 1-based column number to its A1 letters (1 -> A, 27 -> AA).
+    
+    Args:
+        number (int): Column number (>= 1)
+        
+    Returns:
+        str: Column letters
+    """
+    letters = ''
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
 
 
 class SheetsService:
@@ -30,6 +56,15 @@ class SheetsService:
         self.credentials = credentials
         self.spreadsheet_id = spreadsheet_id or config.SPREADSHEET_ID
         self.sheet_name = sheet_name or config.SHEET_NAME
+        
+        # A1 ranges for the configured columns, built once
+        last_column = _column_letter(len(config.SHEET_HEADERS))
+        self._header_range = f"{self.sheet_name}!A1:{last_column}1"
+        self._rows_range = f"{self.sheet_name}!A:{last_column}"
+        
+        # Message IDs in the sheet, once read; kept current by append_rows()
+        self._cached_ids = None
+        
         self.service = None
         self.build_service()
     
@@ -41,7 +76,7 @@ class SheetsService:
             Exception: If service building fails
         """
         try:
-            self.service = build('sheets', 'v4', credentials=self.credentials)
+            self.service = build('sheets', 'v4', **build_kwargs(self.credentials))
             print("✅ Google Sheets service initialized")
         except Exception as e:
             raise Exception(f"Failed to build Sheets service: {e}")
@@ -62,13 +97,17 @@ class SheetsService:
         """
         if headers is None:
             headers = config.SHEET_HEADERS
+            range_name = self._header_range
+        else:
+            range_name = f"{self.sheet_name}!A1:{_column_letter(len(headers))}1"
         
         try:
             # Read first row
-            range_name = f"{self.sheet_name}!A1:{chr(65 + len(headers) - 1)}1"
             result = self.service.spreadsheets().values().get(
                 spreadsheetId=self.spreadsheet_id,
-                range=range_name
+                range=range_name,
+                fields='values',
+                prettyPrint=False
             ).execute()
             
             existing_values = result.get('values', [])
@@ -105,74 +144,99 @@ class SheetsService:
         
         Args:
             values (list): List of values to append as a row.
-                          Order should match SHEET_HEADERS:
-                          [message_id, from, subject, date, content]
+                          Order should match SHEET_HEADERS
             
         Returns:
             bool: True if successful, False otherwise
         """
-        try:
-            # Define the range (sheet name with ! to indicate entire sheet)
-            range_name = f"{self.sheet_name}!A:S"  # A to E covers 5 columns
-            
-            # Prepare the request body
-            body = {
-                'values': [values]  # Wrap in list because append expects 2D array
-            }
-            
-            # Append the row
-            result = self.service.spreadsheets().values().append(
-                spreadsheetId=self.spreadsheet_id,
-                range=range_name,
-                valueInputOption='RAW',  # Insert exactly as provided
-                insertDataOption='INSERT_ROWS',  # Insert new rows
-                body=body
-            ).execute()
-            
-            # Get info about what was updated
-            updates = result.get('updates', {})
-            updated_range = updates.get('updatedRange', '')
-            
-            print(f"   ✅ Appended to {updated_range}")
-            
-            return True
+        return self.append_rows([values]) == 1
+    
+    def append_rows(self, rows):
+        """
+        Append many rows to the spreadsheet.
+        
+        Rows are sent APPEND_CHUNK_ROWS at a time, one append request per
+        chunk, in order. Stops at the first failed chunk so the caller can
+        tell exactly which rows made it into the sheet. A chunk is retried
+        on rate limiting only: after a 5xx it may already be in the sheet.
+        
+        Args:
+            rows (list): List of rows (each a list of values, ordered like
+                         SHEET_HEADERS)
             
-        except HttpError as error:
-            print(f"❌ Error appending row: {error}")
-            return False
-        except Exception as e:
-            print(f"❌ Unexpected error: {e}")
-            return False
+        Returns:
+            int: Number of leading rows appended (len(rows) on full success)
+        """
+        range_name = self._rows_range
+        appended = 0
+        
+        for start in range(0, len(rows), APPEND_CHUNK_ROWS):
+            chunk = rows[start:start + APPEND_CHUNK_ROWS]
+            try:
+                result = execute_non_idempotent(self.service.spreadsheets().values().append(
+                    spreadsheetId=self.spreadsheet_id,
+                    range=range_name,
+                    valueInputOption='RAW',
+                    insertDataOption='INSERT_ROWS',
+                    body={'values': chunk}
+                ))
+                
+                updated_range = result.get('updates', {}).get('updatedRange', '')
+                print(f"   ✅ Appended {len(chunk)} row(s) to {updated_range}")
+                appended += len(chunk)
+                if self._cached_ids is not None:
+                    self._cached_ids.update(row[0] for row in chunk if row and row[0])
+                
+            except HttpError as error:
+                print(f"❌ Error appending rows: {error}")
+                break
+            except Exception as e:
+                print(f"❌ Unexpected error: {e}")
+                break
+        
+        return appended
     
-    def get_all_message_ids(self):
+    def get_all_message_ids(self, force=False):
         """
         Get all message IDs currently in the sheet (for duplicate checking).
         
         Reads the first column (Message ID) from all rows except header.
-        Returns as a set for fast lookup.
+        Returns as a set for fast lookup. The column is read from the API
+        once per service; later calls return the cached IDs (plus any rows
+        appended since) unless force is True.
+        
+        Args:
+            force (bool): Re-read the column from the sheet
         
         Returns:
             set: Set of message IDs already in the sheet
         """
+        if self._cached_ids is not None and not force:
+            return set(self._cached_ids)
+        
         try:
             # Read first column (A) from row 2 onwards (skip header)
             range_name = f"{self.sheet_name}!A2:A"
             
+            # Column-major, so the response is one flat list of IDs rather
+            # than a one-element list per row; no server-side formatting
             result = self.service.spreadsheets().values().get(
                 spreadsheetId=self.spreadsheet_id,
-                range=range_name
+                range=range_name,
+                majorDimension='COLUMNS',
+                valueRenderOption='UNFORMATTED_VALUE',
+                fields='values',
+                prettyPrint=False
             ).execute()
             
-            values = result.get('values', [])
-            
-            # Extract message IDs (first column of each row)
-            # values is a list of lists: [['id1'], ['id2'], ...]
-            message_ids = set()
-            for row in values:
-                if row and row[0]:  # Check row exists and has a value
-                    message_ids.add(row[0])
+            # values is [['id1', 'id2', ...]], or missing for an empty sheet
+            columns = result.get('values') or [[]]
+            message_ids = set(columns[0])
+            message_ids.discard('')  # Blank cells between rows
             
-            return message_ids
+            # Only a successful read is cached; errors are retried next call
+            self._cached_ids = message_ids
+            return set(message_ids)
             
         except HttpError as error:
             print(f"⚠️  Warning: Error reading message IDs from sheet: {error}")
@@ -193,7 +257,9 @@ class SheetsService:
             range_name = f"{self.sheet_name}!A:A"
             result = self.service.spreadsheets().values().get(
                 spreadsheetId=self.spreadsheet_id,
-                range=range_name
+                range=range_name,
+                fields='values',
+                prettyPrint=False
             ).execute()
             
             values = result.get('values', [])
@@ -3,14 +3,43 @@ State Manager Module
 Handles persistence of processed email IDs to prevent duplicates.
 """
 
-import json
 import os
 from datetime import datetime
+from itertools import islice
 import sys
 
 # Add parent directory to path to import config
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT_DIR not in sys.path:
+    sys.path.append(_ROOT_DIR)
 import config
+import fast_json
+
+# IDs recorded in the journal before save_state() folds it back into the
+# state file
+JOURNAL_COMPACT_IDS = 10000
+
+# Indented state file for reading by hand; compact JSON by default
+STATE_PRETTY_JSON = getattr(config, 'STATE_PRETTY_JSON', False)
+
+
+def _fsync_directory(path):
+    """
+    Make a rename, create or delete in path's directory durable.
+    
+    fsync() on a file does not cover its directory entry. Directories can
+    only be opened (and synced) like this on POSIX; elsewhere it is a no-op.
+    
+    Args:
+        path (str): File whose directory to sync
+    """
+    if os.name != 'posix':
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
 
 
 class StateManager:
@@ -19,23 +48,56 @@ class StateManager:
     
     Tracks which email message IDs have been processed to prevent
     duplicates when the script runs multiple times.
+    
+    save_state() appends the IDs marked since the last save to a journal
+    (state file + '.log') instead of rewriting every ID ever processed;
+    the journal is replayed on load and folded back into the state file
+    every JOURNAL_COMPACT_IDS IDs.
     """
     
-    def __init__(self, state_file=None):
+    def __init__(self, state_file=None, autosave_every=None, verbose=True):
         """
         Initialize state manager.
         
         Args:
             state_file (str, optional): Path to state file.
                                        Defaults to config.STATE_FILE
+            autosave_every (int, optional): Call save_state() automatically
+                                       once this many IDs are marked
+                                       unsaved. Default: only explicit
+                                       saves (or leaving a with block)
+            verbose (bool): Print load / save / filter progress. Warnings
+                           and errors are printed either way
         """
         self.state_file = state_file or config.STATE_FILE
+        self.verbose = verbose
+        self.journal_file = self.state_file + '.log'
         self.state = {
-            'processed_message_ids': [],
+            'processed_message_ids': {},
             'last_run_timestamp': None,
             'total_emails_processed': 0
         }
+        # In memory the IDs are the keys of an insertion-ordered dict: O(1)
+        # lookups, and the order decides which entries remove_old_entries()
+        # drops. Saved as a list.
+        self._processed = self.state['processed_message_ids']
+        # Changes not yet saved, and IDs in the journal file
+        self._unsaved_ids = []
+        self._unsaved_merged = []
+        self._journal_ids = 0
+        # True when the state file must be rewritten instead of journaled
+        self._needs_rewrite = False
+        self.autosave_every = None
         self.load_state()
+        self.autosave_every = autosave_every
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Save on leaving a with block, also after an error."""
+        self.save_state()
+        return False
     
     def load_state(self):
         """
@@ -47,55 +109,149 @@ class StateManager:
         Returns:
             dict: Loaded state data
         """
-        if os.path.exists(self.state_file):
-            try:
-                with open(self.state_file, 'r') as f:
-                    self.state = json.load(f)
-                print(f"📋 Loaded state: {len(self.state['processed_message_ids'])} processed email(s)")
-                return self.state
-            except json.JSONDecodeError as e:
-                print(f"⚠️  Warning: State file corrupted, creating new one: {e}")
-                self._initialize_state()
-            except Exception as e:
-                print(f"⚠️  Warning: Error loading state: {e}")
-                self._initialize_state()
-        else:
-            print("📝 No existing state file, creating new one")
+        try:
+            # Read as bytes: orjson (when installed) parses them directly
+            with open(self.state_file, 'rb') as f:
+                self.state = fast_json.loads(f.read())
+            self._processed = dict.fromkeys(self.state['processed_message_ids'])
+            self.state['processed_message_ids'] = self._processed
+            self._replay_journal()
+            # Already saved; only changes made after loading are journaled
+            self._unsaved_ids = []
+            self._unsaved_merged = []
+            if self.verbose:
+                print(f"📋 Loaded state: {len(self._processed)} processed email(s)")
+            return self.state
+        except FileNotFoundError:
+            if self.verbose:
+                print("📝 No existing state file, creating new one")
+            self._initialize_state()
+        except fast_json.JSONDecodeError as e:
+            print(f"⚠️  Warning: State file corrupted, creating new one: {e}")
+            self._initialize_state()
+        except Exception as e:
+            print(f"⚠️  Warning: Error loading state: {e}")
             self._initialize_state()
         
         return self.state
     
+    def _replay_journal(self):
+        """Apply the journal's saved changes on top of the loaded state file."""
+        self._journal_ids = 0
+        
+        # Replaying must not trigger a save of the half-replayed state
+        autosave_every, self.autosave_every = self.autosave_every, None
+        try:
+            self._apply_journal()
+        except FileNotFoundError:
+            pass  # Nothing saved since the last state file rewrite
+        finally:
+            self.autosave_every = autosave_every
+    
+    def _apply_journal(self):
+        """Read the journal entries into the state (used by _replay_journal)."""
+        with open(self.journal_file, 'rb') as f:
+            for line in f:
+                try:
+                    entry = fast_json.loads(line)
+                except fast_json.JSONDecodeError:
+                    # Only the last line can be cut short (by a crash mid-save);
+                    # rewrite rather than append after it
+                    print("⚠️  Warning: Ignoring incomplete state journal entry")
+                    self._needs_rewrite = True
+                    continue
+                
+                self.mark_as_processed_many(entry.get('processed', ()))
+                self.merge(entry.get('merged', ()))
+                if entry.get('last_run_timestamp'):
+                    self.state['last_run_timestamp'] = entry['last_run_timestamp']
+                self._journal_ids += len(entry.get('processed', ())) + len(entry.get('merged', ()))
+    
     def _initialize_state(self):
         """Initialize empty state (internal method)."""
         self.state = {
-            'processed_message_ids': [],
+            'processed_message_ids': {},
             'last_run_timestamp': None,
             'total_emails_processed': 0
         }
+        self._processed = self.state['processed_message_ids']
+        self._unsaved_ids = []
+        self._unsaved_merged = []
+        # A journal left next to a missing or unreadable state file is not
+        # replayed; the next save replaces both
+        self._needs_rewrite = True
     
     def save_state(self):
         """
         Save current state to JSON file.
         
-        Uses atomic write (write to temp file, then rename) to prevent
-        corruption if script crashes during write.
+        Normally appends one journal line with the IDs marked since the
+        last save. The state file itself is rewritten when it does not
+        exist yet, after clear_state() / remove_old_entries(), or once the
+        journal holds JOURNAL_COMPACT_IDS IDs. That rewrite uses atomic
+        write (write to temp file, then rename) to prevent corruption if
+        script crashes during write.
+        
+        Nothing is written (and the last run timestamp is left as is) when
+        no ID was marked since the last save.
         
         Returns:
             bool: True if successful, False otherwise
         """
+        unsaved = len(self._unsaved_ids) + len(self._unsaved_merged)
+        if not (unsaved or self._needs_rewrite) and os.path.exists(self.state_file):
+            if self.verbose:
+                print("💾 State unchanged, nothing to save")
+            return True
+        
         try:
             # Update last run timestamp
             self.state['last_run_timestamp'] = datetime.now().isoformat()
             
-            # Write to temporary file first (atomic write)
-            temp_file = self.state_file + '.tmp'
-            with open(temp_file, 'w') as f:
-                json.dump(self.state, f, indent=2)
+            if (self._needs_rewrite or not os.path.exists(self.state_file)
+                    or self._journal_ids + unsaved >= JOURNAL_COMPACT_IDS):
+                # Write to temporary file first (atomic write)
+                temp_file = self.state_file + '.tmp'
+                with open(temp_file, 'wb') as f:
+                    f.write(fast_json.dumps(
+                        dict(self.state, processed_message_ids=list(self._processed)),
+                        indent=STATE_PRETTY_JSON
+                    ))
+                    # On disk before the rename, or a crash can leave an empty file
+                    f.flush()
+                    os.fsync(f.fileno())
+                
+                # Rename temp file to actual file (atomic operation)
+                os.replace(temp_file, self.state_file)
+                _fsync_directory(self.state_file)
+                
+                # Everything in the journal is now in the state file (replay
+                # is idempotent, so losing this delete in a crash is harmless)
+                if os.path.exists(self.journal_file):
+                    os.remove(self.journal_file)
+                self._journal_ids = 0
+                self._needs_rewrite = False
+            else:
+                entry = {'last_run_timestamp': self.state['last_run_timestamp']}
+                if self._unsaved_ids:
+                    entry['processed'] = self._unsaved_ids
+                if self._unsaved_merged:
+                    entry['merged'] = self._unsaved_merged
+                
+                new_journal = not os.path.exists(self.journal_file)
+                with open(self.journal_file, 'ab') as f:
+                    f.write(fast_json.dumps(entry) + b'\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                if new_journal:
+                    _fsync_directory(self.journal_file)
+                self._journal_ids += unsaved
             
-            # Rename temp file to actual file (atomic operation)
-            os.replace(temp_file, self.state_file)
+            self._unsaved_ids = []
+            self._unsaved_merged = []
             
-            print(f"💾 State saved: {len(self.state['processed_message_ids'])} total processed")
+            if self.verbose:
+                print(f"💾 State saved: {len(self._processed)} total processed")
             return True
             
         except Exception as e:
@@ -112,21 +268,73 @@ class StateManager:
         Returns:
             bool: True if already processed, False if new
         """
-        return message_id in self.state['processed_message_ids']
+        return message_id in self._processed
     
     def mark_as_processed(self, message_id):
         """
         Mark a message ID as processed.
         
         Adds to the processed list and increments counter.
-        Does NOT save to file automatically - call save_state() after batch.
+        Does NOT save to file automatically (unless autosave_every is set) -
+        call save_state() after batch.
         
         Args:
             message_id (str): Gmail message ID
         """
-        if message_id not in self.state['processed_message_ids']:
-            self.state['processed_message_ids'].append(message_id)
+        if message_id not in self._processed:
+            self._processed[message_id] = None
             self.state['total_emails_processed'] += 1
+            self._unsaved_ids.append(message_id)
+            self._autosave()
+    
+    def mark_as_processed_many(self, message_ids):
+        """
+        Mark several message IDs as processed.
+        
+        Same as calling mark_as_processed() for each ID. Like it, does NOT
+        save to file - save_state() writes everything once.
+        
+        Args:
+            message_ids (list): Gmail message IDs
+        """
+        processed = self._processed
+        unsaved = self._unsaved_ids
+        before = len(unsaved)
+        for message_id in message_ids:
+            if message_id not in processed:
+                processed[message_id] = None
+                unsaved.append(message_id)
+        self.state['total_emails_processed'] += len(unsaved) - before
+        self._autosave()
+    
+    def _autosave(self):
+        """Save once autosave_every IDs are waiting to be saved."""
+        if self.autosave_every and len(self._unsaved_ids) >= self.autosave_every:
+            self.save_state()
+    
+    def merge(self, message_ids):
+        """
+        Record message IDs that were processed outside this state file.
+        
+        Used to reconcile with the IDs already in the sheet (e.g. when the
+        state file was lost). Unlike mark_as_processed_many(), the processed
+        counter is not incremented; these emails were counted when they were
+        first processed. Does NOT save to file.
+        
+        Args:
+            message_ids (iterable): Gmail message IDs
+            
+        Returns:
+            int: Number of IDs that were not yet known
+        """
+        processed = self._processed
+        added = 0
+        for message_id in message_ids:
+            if message_id not in processed:
+                processed[message_id] = None
+                self._unsaved_merged.append(message_id)
+                added += 1
+        return added
     
     def filter_new_messages(self, message_ids):
         """
@@ -138,10 +346,12 @@ class StateManager:
         Returns:
             list: Only the message IDs that haven't been processed yet
         """
+        # Dict lookups, keeping the input order (newest first from Gmail)
+        processed = self._processed
         new_ids = [msg_id for msg_id in message_ids 
-                   if not self.is_processed(msg_id)]
+                   if msg_id not in processed]
         
-        if len(new_ids) < len(message_ids):
+        if self.verbose and len(new_ids) < len(message_ids):
             skipped = len(message_ids) - len(new_ids)
             print(f"⏭️  Skipping {skipped} already-processed email(s)")
         
@@ -160,7 +370,7 @@ class StateManager:
         return {
             'total_processed': self.state['total_emails_processed'],
             'last_run': self.state['last_run_timestamp'],
-            'message_count': len(self.state['processed_message_ids'])
+            'message_count': len(self._processed)
         }
     
     def clear_state(self):
@@ -188,14 +398,17 @@ class StateManager:
         Returns:
             int: Number of entries removed
         """
-        current_count = len(self.state['processed_message_ids'])
+        current_count = len(self._processed)
         
         if current_count > keep_count:
             removed = current_count - keep_count
             # Keep only the last N entries
-            self.state['processed_message_ids'] = \
-                self.state['processed_message_ids'][-keep_count:]
-            print(f"🧹 Cleaned up {removed} old state entries")
+            self._processed = dict.fromkeys(islice(self._processed, removed, None))
+            self.state['processed_message_ids'] = self._processed
+            # The journal cannot express removals
+            self._needs_rewrite = True
+            if self.verbose:
+                print(f"🧹 Cleaned up {removed} old state entries")
             return removed
         
         return 0
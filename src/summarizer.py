@@ -5,19 +5,38 @@ Uses Google Gemini API to generate concise email summaries.
 
 
 import os
+import re
 import sys
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 load_dotenv()
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if _ROOT_DIR not in sys.path:
+    sys.path.append(_ROOT_DIR)
 import config
+from llm_cache import LLMCache, content_key
+from llm_client import get_model, gemini_available
+from rate_limiter import get_rate_limiter
 
-try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
+# The SDK itself is imported by get_model() when the summarizer is set up
+GEMINI_AVAILABLE = gemini_available()
+if not GEMINI_AVAILABLE:
     print("⚠️  Warning: google-generativeai not installed. Summaries will be disabled.")
+
+# Failed summaries are logged, not printed: summarize_batch() workers share
+# the console with every other thread
+log = logging.getLogger(__name__)
+
+# Concurrent Gemini requests in summarize_batch(); the shared rate limiter
+# still caps the overall request rate
+LLM_WORKERS = 8
+
+# Quoted reply lines ("> ...") repeat earlier mail; whitespace runs are
+# collapsed so the 2000-character prompt cap holds more of the new text
+_QUOTED_LINE_RE = re.compile(r'^>.*$', re.MULTILINE)
+_WHITESPACE_RE = re.compile(r'\s+')
     
 class EmailSummarizer:
     """Handles AI-powered email summarization using Gemini."""
@@ -44,10 +63,13 @@ class EmailSummarizer:
             return
         
         try:
-            # Configure Gemini
-            genai.configure(api_key=self.api_key)
-            
-            self.model = genai.GenerativeModel(config.GEMINI_MODEL)
+            # One model (and API client) shared by every Gemini service
+            self.model = get_model(self.api_key)
+            # Template mail (alerts, receipts) gets the same summary back
+            # without a request
+            self.cache = LLMCache('summaries')
+            # Shared with every other caller of this model
+            self.rate_limiter = get_rate_limiter(config.GEMINI_MODEL)
             
             print("✅ Gemini AI summarizer initialized")
             
@@ -71,15 +93,27 @@ class EmailSummarizer:
         
         try:
             # Truncate content to avoid token limits (first 2000 chars)
-            content_snippet = parsed_email.get('content', '')[:2000]
+            content = _QUOTED_LINE_RE.sub('', parsed_email.get('content', ''))
+            content_snippet = _WHITESPACE_RE.sub(' ', content).strip()[:2000]
+            subject = parsed_email.get('subject', '')
+            sender = parsed_email.get('from', '')
+            
+            cache_key = content_key(
+                config.GEMINI_MODEL, 'summary', config.SUMMARY_PROMPT_TEMPLATE,
+                sender, subject, content_snippet
+            )
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
             
             prompt = config.SUMMARY_PROMPT_TEMPLATE.format(
-                subject=parsed_email.get('subject', ''),
-                sender=parsed_email.get('from', ''),
+                subject=subject,
+                sender=sender,
                 content=content_snippet
             )
             
             # Generate summary
+            self.rate_limiter.acquire()
             response = self.model.generate_content(prompt)
             
             # Extract text
@@ -88,11 +122,32 @@ class EmailSummarizer:
             if len(summary) > 200:
                 summary = summary[:197] + "..."
             
+            self.cache.set(cache_key, summary)
             return summary
         
         except Exception as e:
-            print(f"   ⚠️  Summary generation failed: {e}")
+            log.warning("   ⚠️  Summary generation failed: %s", e)
             return self._fallback_summary(parsed_email)
+    
+    def summarize_batch(self, parsed_emails):
+        """
+        Summarize many emails concurrently.
+        
+        Each email goes through summarize_email() on a thread pool, so one
+        failed request only falls back for that email.
+        
+        Args:
+            parsed_emails (list): Parsed email dicts
+            
+        Returns:
+            list: Summaries aligned with parsed_emails
+        """
+        if not self.model or len(parsed_emails) < 2:
+            # Fallback summaries are CPU-only; threads would not help
+            return [self.summarize_email(email) for email in parsed_emails]
+        
+        with ThreadPoolExecutor(max_workers=min(LLM_WORKERS, len(parsed_emails))) as pool:
+            return list(pool.map(self.summarize_email, parsed_emails))
         
     def _fallback_summary(self, parsed_email):
         """